@@ -1,36 +1,77 @@
-from flask import Flask, request, jsonify
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify
 from utils.config import Config
 from utils.logging_config import setup_app_logging
 from models.database import db
 from controllers.ticket_controller import TicketController
 from scheduler import task_scheduler
+from services.admission_control import get_admission_stats
+from services.ai_task_service import collect_queue_metrics
+from services.ticket_service import upstream_flight
+from utils.cache import get_cache_stats
+from utils.circuit_breaker import get_circuit_breaker_stats
+from utils.http_client import get_http_pool_stats
+from utils.metrics import counter, histogram, render_metrics
+from utils.profiler import get_profiler, get_profiler_stats, install_signal_handler
+from utils.query_stats import begin_scope, end_scope, install_query_stats, server_timing_enabled
+from utils.rate_limiter import get_rate_limiter_stats
+from utils.task_notifier import task_notifier
+from utils.tracing import tracer
 import logging
 
-def create_app():
+http_request_duration = histogram('wecode_http_request_duration_seconds', 'HTTP请求处理耗时', ['method', 'route'])
+http_requests = counter('wecode_http_requests_total', 'HTTP请求数', ['method', 'route', 'status'])
+
+def create_app(role=None):
     """
     创建Flask应用实例
+    
+    Args:
+        role: 进程角色，如独立worker进程的名称；日志和链路追踪文件名带上该后缀，Web进程为空
     """
     app = Flask(__name__)
     
     # 加载配置
     config = Config()
     app.config.from_object(config)
+    app.config['PROCESS_ROLE'] = role
     
-    # 设置日志系统
+    # 设置日志系统，各进程写各自的日志文件
     app_logger = setup_app_logging(
         app_name='WeCodeSecTools',
-        log_dir=config.LOG_DIR
+        log_dir=config.LOG_DIR,
+        config=config,
+        role=role
     )
     
     # 初始化数据库
     db.init_app(app)
     
+    # 统计每个请求和调度执行的SQL条数与数据库耗时
+    install_query_stats(app.config)
+    
+    # 配置跨进程任务唤醒目标
+    task_notifier.configure(config.SCHEDULER_WAKEUP_TARGETS)
+    
+    # 启动链路追踪的span导出线程
+    tracer.configure(app.config)
+    
     # 创建控制器实例
     ticket_controller = TicketController()
     
     # 注册API路由 - 使用add_resource方式集中管理
     _register_api_routes(app, ticket_controller)
     
+    # 记录各路由的请求耗时和响应状态
+    _register_metrics_hooks(app)
+    
+    # 为每个请求创建或延续链路，创建的AI任务随之保存链路上下文
+    _register_tracing_hooks(app)
+    
+    # 携带性能分析令牌的请求采样处理线程的调用栈
+    _register_profiler_hooks(app, get_profiler(app.config))
+    
     # 创建数据库表
     with app.app_context():
         try:
@@ -79,9 +120,58 @@ def _register_api_routes(app, ticket_controller):
         return jsonify({
             'success': True,
             'message': '服务运行正常',
-            'status': 'healthy'
+            'status': 'healthy',
+            'http_pool': get_http_pool_stats(),
+            'cache': get_cache_stats(),
+            'upstream_coalescing': upstream_flight.stats(),
+            'rate_limiters': get_rate_limiter_stats(),
+            'circuit_breakers': get_circuit_breaker_stats(),
+            'admission': get_admission_stats(),
+            'profiler': get_profiler_stats(),
+            'tracing': tracer.stats()
         }), 200
     
+    # 运行指标接口
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus文本格式的运行指标"""
+        try:
+            collect_queue_metrics()
+        except Exception as e:
+            logging.getLogger('WeCodeSecTools').error(f"采集队列指标失败: {str(e)}")
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    # 性能分析接口，在指定时长内采样所有线程
+    @app.route('/admin/profile', methods=['POST'])
+    def start_profile():
+        """开启限时的性能分析"""
+        profiler = get_profiler(app.config)
+        if not profiler.check_token(request.headers.get('X-Profile-Token', '')):
+            return jsonify({
+                'success': False,
+                'data': None,
+                'message': '无权开启性能分析'
+            }), 403
+        
+        try:
+            seconds = int(request.args.get('seconds', profiler.default_seconds))
+        except ValueError:
+            seconds = 0
+        if seconds <= 0:
+            return jsonify({
+                'success': False,
+                'data': None,
+                'message': 'seconds必须为正整数'
+            }), 400
+        
+        seconds = min(seconds, profiler.max_seconds)
+        profiler.start('window', seconds=seconds)
+        return jsonify({
+            'success': True,
+            'data': {'seconds': seconds, 'output_dir': str(profiler.output_dir)},
+            'message': f'性能分析已开启，{seconds} 秒后写入结果'
+        }), 202
+    
     # 根路径
     @app.route('/', methods=['GET'])
     def index():
@@ -92,18 +182,126 @@ def _register_api_routes(app, ticket_controller):
             'version': '1.0.0',
             'endpoints': {
                 'tickets': '/tickets/events',
-                'health': '/health'
+                'health': '/health',
+                'metrics': '/metrics',
+                'profile': '/admin/profile'
             }
         }), 200
 
+def _register_metrics_hooks(app):
+    """
+    注册请求耗时、状态码和SQL执行统计，路由按URL规则聚合，避免工单ID等路径参数产生大量标签
+    """
+    
+    @app.before_request
+    def start_timer():
+        g.request_start = time.monotonic()
+        begin_scope('request', request.url_rule.rule if request.url_rule else 'unmatched')
+    
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_request_duration.observe(time.monotonic() - start, request.method, route)
+            http_requests.inc(request.method, route, response.status_code)
+        
+        # 本次请求的数据库耗时和SQL条数，浏览器开发者工具可直接展示
+        query_stats = end_scope()
+        if query_stats is not None and server_timing_enabled():
+            response.headers.add('Server-Timing', query_stats.server_timing())
+        return response
+    
+    @app.teardown_request
+    def finish_query_stats(exc):
+        # 请求异常未经过after_request时在此结束统计，避免计入同一线程的下一个请求
+        end_scope()
+
+def _register_tracing_hooks(app):
+    """
+    注册请求链路追踪，请求头traceparent存在时延续上游链路，否则新建链路，
+    响应头traceparent返回本次请求的span，便于按链路查找后续的AI任务处理记录
+    """
+    
+    @app.before_request
+    def start_request_span():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = tracer.start_span(
+            f'{request.method} {route}',
+            parent=request.headers.get('traceparent'),
+            kind='server',
+            attributes={'http.method': request.method, 'http.route': route}
+        )
+        g.trace_span = span
+        g.trace_token = tracer.activate(span)
+    
+    @app.after_request
+    def end_request_span(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.set_error(f'HTTP {response.status_code}')
+            if span.context.sampled:
+                response.headers['traceparent'] = span.context.to_traceparent()
+        return response
+    
+    @app.teardown_request
+    def finish_request_span(exc):
+        span = g.pop('trace_span', None)
+        token = g.pop('trace_token', None)
+        if span is not None:
+            if exc is not None:
+                span.set_error(exc)
+            span.end()
+        if token is not None:
+            tracer.deactivate(token)
+
+def _register_profiler_hooks(app, profiler):
+    """
+    注册单个请求的性能分析，请求头X-Profile-Token与配置的令牌一致时采样本次请求的处理线程，
+    结果文件名通过响应头X-Profile-File返回；未配置令牌时不做任何处理
+    """
+    
+    @app.before_request
+    def start_request_profile():
+        # 管理接口本身开启的是全部线程的限时采样，不再单独采样
+        if profiler.enabled and 'X-Profile-Token' in request.headers and request.endpoint != 'start_profile':
+            if profiler.check_token(request.headers['X-Profile-Token']):
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                g.profile_session = profiler.start(f'request{route}', thread_ids={threading.get_ident()})
+    
+    @app.after_request
+    def stop_request_profile(response):
+        session = g.pop('profile_session', None)
+        if session is not None:
+            path = profiler.stop(session)
+            if path:
+                response.headers['X-Profile-File'] = path.name
+        return response
+    
+    @app.teardown_request
+    def finish_request_profile(exc):
+        # 请求异常未经过after_request时在此结束采样
+        session = g.pop('profile_session', None)
+        if session is not None:
+            profiler.stop(session)
+
 def main():
     """
     主函数
     """
     app = create_app()
     
-    # 启动定时任务调度器
-    task_scheduler.start()
+    # 收到SIGUSR2时开启限时的性能分析
+    if app.config['PROFILER_SIGNAL']:
+        install_signal_handler(get_profiler(app.config))
+    
+    # 启动定时任务调度器，AI任务由独立的worker进程处理时不启动
+    if app.config['FLASK_RUN_SCHEDULER']:
+        task_scheduler.start(app)
+    else:
+        logging.getLogger('WeCodeSecTools').info("Web进程不处理AI任务，请使用 worker.py 启动任务处理进程")
     
     try:
         # 启动Flask应用
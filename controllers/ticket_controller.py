@@ -1,5 +1,11 @@
-from flask import request, jsonify
+import math
+from flask import current_app, request, jsonify
+from models import EventActivity, EventArtifact
+from services.admission_control import AdmissionRejectedError
+from utils.circuit_breaker import CircuitOpenError
 from utils.logging_config import get_logger
+from utils.rate_limiter import RateLimitTimeout
+from utils.pagination import decode_cursor, encode_cursor, parse_limit
 
 logger = get_logger(__name__)
 
@@ -18,6 +24,80 @@ class TicketController:
             from services.ai_task_service import AITaskService
             self.ai_task_service = AITaskService()
     
+    def _use_cache(self):
+        """请求头包含 Cache-Control: no-cache 或 X-Cache-Bypass 时跳过缓存"""
+        cache_control = request.headers.get('Cache-Control', '').lower()
+        return 'no-cache' not in cache_control and not request.headers.get('X-Cache-Bypass')
+    
+    def _circuit_open_response(self, error):
+        """上游熔断时返回503，并通过Retry-After提示客户端重试时间"""
+        retry_after = max(int(math.ceil(error.retry_after)), 1)
+        return jsonify({
+            'success': False,
+            'message': '第三方服务暂不可用，请稍后重试'
+        }), 503, {'Retry-After': str(retry_after)}
+    
+    def _rate_limited_response(self, error):
+        """出站请求等待令牌超时时返回429，并通过Retry-After提示客户端重试时间"""
+        retry_after = max(int(math.ceil(error.retry_after)), 1)
+        return jsonify({
+            'success': False,
+            'message': '第三方服务请求过于频繁，请稍后重试'
+        }), 429, {'Retry-After': str(retry_after)}
+    
+    def _get_limit(self):
+        """读取limit参数，缺省或超出范围时按分页配置处理"""
+        return parse_limit(
+            request.args.get('limit', type=int),
+            current_app.config['PAGINATION_DEFAULT_LIMIT'],
+            current_app.config['PAGINATION_MAX_LIMIT']
+        )
+    
+    def _get_cursor(self):
+        """
+        读取cursor参数
+        
+        Returns:
+            tuple: 上一页最后一条记录的(created_at, id)，未传游标时为None
+        
+        Raises:
+            ValueError: 游标格式不正确
+        """
+        cursor = request.args.get('cursor')
+        return decode_cursor(cursor) if cursor else None
+    
+    def _get_fields(self, model):
+        """
+        读取fields参数（逗号分隔的字段名），id和created_at总是返回以便翻页
+        
+        Args:
+            model: 列表对应的模型类
+        
+        Returns:
+            list: 按模型字段顺序排列的字段名，未传fields时为None
+        
+        Raises:
+            ValueError: 包含模型不支持的字段
+        """
+        value = request.args.get('fields')
+        if not value:
+            return None
+        
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested - set(model.FIELDS)
+        if unknown:
+            raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}")
+        
+        requested.update(('id', 'created_at'))
+        return [name for name in model.FIELDS if name in requested]
+    
+    def _bad_request_response(self, message):
+        """请求参数不正确时返回400"""
+        return jsonify({
+            'success': False,
+            'message': message
+        }), 400
+    
     def get_tickets(self):
         """
         GET /tickets/events?offset=1&size=10&status=open&time=24h&keyword=xx
@@ -34,7 +114,7 @@ class TicketController:
             keyword = request.args.get('keyword')
             
             # 调用服务获取工单数据
-            result = self.ticket_service.get_tickets(offset, size, status, time, keyword)
+            result = self.ticket_service.get_tickets(offset, size, status, time, keyword, use_cache=self._use_cache())
             
             if result is not None:
                 return jsonify({
@@ -48,6 +128,12 @@ class TicketController:
                     'message': '获取工单列表失败'
                 }), 500
                 
+        except CircuitOpenError as e:
+            logger.warning(f"获取工单列表熔断: {str(e)}")
+            return self._circuit_open_response(e)
+        except RateLimitTimeout as e:
+            logger.warning(f"获取工单列表限流: {str(e)}")
+            return self._rate_limited_response(e)
         except Exception as e:
             logger.error(f"获取工单列表异常: {str(e)}")
             return jsonify({
@@ -64,7 +150,7 @@ class TicketController:
             self._init_services()
             
             # 调用服务获取工单详情
-            result = self.ticket_service.get_ticket_detail(event_id)
+            result = self.ticket_service.get_ticket_detail(event_id, use_cache=self._use_cache())
             
             if result is not None:
                 return jsonify({
@@ -78,6 +164,12 @@ class TicketController:
                     'message': '获取工单详情失败'
                 }), 500
                 
+        except CircuitOpenError as e:
+            logger.warning(f"获取工单详情熔断: {str(e)}")
+            return self._circuit_open_response(e)
+        except RateLimitTimeout as e:
+            logger.warning(f"获取工单详情限流: {str(e)}")
+            return self._rate_limited_response(e)
         except Exception as e:
             logger.error(f"获取工单详情异常: {str(e)}")
             return jsonify({
@@ -104,6 +196,7 @@ class TicketController:
             
             app_id = data.get('app_id')
             task_content = data.get('task_content')
+            priority = data.get('priority', 0)
             
             if not app_id or not task_content:
                 return jsonify({
@@ -111,8 +204,23 @@ class TicketController:
                     'message': 'app_id和task_content不能为空'
                 }), 400
             
+            priority_min = current_app.config['SCHEDULER_PRIORITY_MIN']
+            priority_max = current_app.config['SCHEDULER_PRIORITY_MAX']
+            if not isinstance(priority, int) or isinstance(priority, bool) or not priority_min <= priority <= priority_max:
+                return jsonify({
+                    'success': False,
+                    'message': f'priority必须为{priority_min}到{priority_max}之间的整数'
+                }), 400
+            
             # 调用服务创建AI任务
-            result = self.ai_task_service.create_ai_task(event_id, app_id, task_content)
+            try:
+                result = self.ai_task_service.create_ai_task(event_id, app_id, task_content, priority)
+            except AdmissionRejectedError as e:
+                logger.warning("拒绝创建AI任务: %s", e)
+                return jsonify({
+                    'success': False,
+                    'message': e.reason
+                }), 429, {'Retry-After': str(int(math.ceil(e.retry_after)))}
             
             if result:
                 return jsonify({
@@ -135,18 +243,33 @@ class TicketController:
 
     def get_activities(self, event_id):
         """
-        GET /tickets/events/<id>/activities
-        返回t_event_activities表的信息
+        GET /tickets/events/<id>/activities?limit=50&cursor=xx&status=complete&app_id=xx&fields=task_id,status,title
+        返回t_event_activities表的信息，按创建时间降序分页，next_cursor为下一页游标
         """
         try:
             self._init_services()
             
+            limit = self._get_limit()
+            try:
+                after = self._get_cursor()
+                fields = self._get_fields(EventActivity)
+            except ValueError as e:
+                return self._bad_request_response(str(e))
+            
             # 调用服务获取AI任务列表
-            result = self.ai_task_service.get_activities_by_event_id(event_id)
+            result, next_key = self.ai_task_service.get_activities_by_event_id(
+                event_id,
+                limit,
+                after,
+                status=request.args.get('status'),
+                app_id=request.args.get('app_id'),
+                fields=fields
+            )
             
             return jsonify({
                 'success': True,
                 'data': result,
+                'next_cursor': encode_cursor(*next_key) if next_key else None,
                 'message': '获取AI任务列表成功'
             }), 200
                 
@@ -159,18 +282,26 @@ class TicketController:
 
     def get_artifacts(self, event_id):
         """
-        GET /tickets/events/<id>/artifacts
-        返回t_event_artifacts信息
+        GET /tickets/events/<id>/artifacts?limit=50&cursor=xx&fields=activity_id,artifact_data
+        返回t_event_artifacts信息，按创建时间升序分页，next_cursor为下一页游标
         """
         try:
             self._init_services()
             
+            limit = self._get_limit()
+            try:
+                after = self._get_cursor()
+                fields = self._get_fields(EventArtifact)
+            except ValueError as e:
+                return self._bad_request_response(str(e))
+            
             # 调用服务获取AI任务结果列表
-            result = self.ai_task_service.get_artifacts_by_event_id(event_id)
+            result, next_key = self.ai_task_service.get_artifacts_by_event_id(event_id, limit, after, fields=fields)
             
             return jsonify({
                 'success': True,
                 'data': result,
+                'next_cursor': encode_cursor(*next_key) if next_key else None,
                 'message': '获取AI任务结果列表成功'
             }), 200
                 
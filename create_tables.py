@@ -42,7 +42,7 @@ def create_tables():
             title VARCHAR(500) DEFAULT NULL COMMENT '任务标题（由AI返回结果填充）',
             description TEXT DEFAULT NULL COMMENT '任务描述（由AI返回结果填充）',
             result TEXT DEFAULT NULL COMMENT '任务结果（由AI返回结果填充）',
-            INDEX idx_event_id (event_id),
+            INDEX idx_event_created (event_id, created_at),
             INDEX idx_task_id (task_id),
             INDEX idx_status (status),
             INDEX idx_created_at (created_at)
@@ -58,11 +58,20 @@ def create_tables():
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
             task_content TEXT NOT NULL COMMENT '任务内容',
-            status VARCHAR(20) DEFAULT 'init' COMMENT '任务状态: init, running, complete',
+            status VARCHAR(20) DEFAULT 'init' COMMENT '任务状态: init, running, complete, failed',
             result TEXT DEFAULT NULL COMMENT '任务结果（由AI返回结果填充）',
+            owner VARCHAR(100) DEFAULT NULL COMMENT '领取任务的工作节点标识',
+            lease_expires_at DATETIME DEFAULT NULL COMMENT '任务租约到期时间',
+            attempts INT NOT NULL DEFAULT 0 COMMENT '已执行失败的次数',
+            next_attempt_at DATETIME DEFAULT NULL COMMENT '下次允许执行的时间，为空时立即执行',
+            last_error TEXT DEFAULT NULL COMMENT '最近一次执行失败的原因',
+            priority INT NOT NULL DEFAULT 0 COMMENT '任务优先级，数值越大越优先',
+            trace_context VARCHAR(55) DEFAULT NULL COMMENT '创建任务的请求的链路上下文（W3C traceparent）',
             INDEX idx_task_id (task_id),
             INDEX idx_app_id (app_id),
-            INDEX idx_status (status),
+            INDEX idx_status_created (status, created_at),
+            INDEX idx_status_priority_app_due (status, priority, app_id, created_at, next_attempt_at),
+            INDEX idx_status_updated (status, updated_at),
             INDEX idx_created_at (created_at)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='AI代理任务异步表'
         """
@@ -75,7 +84,7 @@ def create_tables():
             artifact_data JSON NOT NULL COMMENT 'AI任务返回结果',
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
-            INDEX idx_activity_id (activity_id),
+            INDEX idx_activity_created (activity_id, created_at),
             INDEX idx_created_at (created_at)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='AI任务结果表'
         """
@@ -129,6 +138,7 @@ def main():
         
         if create_tables():
             logger.info("数据表创建完成！")
+            logger.info("已存在的数据库请运行 'python migrate.py' 升级表结构")
             logger.info("现在您可以运行 'python app.py' 来启动应用")
         else:
             logger.error("数据表创建失败")
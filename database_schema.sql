@@ -14,7 +14,7 @@ CREATE TABLE IF NOT EXISTS t_event_activities (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     task_content TEXT NOT NULL COMMENT '任务内容',
     status VARCHAR(20) DEFAULT 'init' COMMENT '任务状态: init, running, complete',
-    INDEX idx_event_id (event_id),
+    INDEX idx_event_created (event_id, created_at),
     INDEX idx_task_id (task_id),
     INDEX idx_status (status),
     INDEX idx_created_at (created_at)
@@ -28,7 +28,7 @@ CREATE TABLE IF NOT EXISTS t_event_artifacts (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     FOREIGN KEY (activity_id) REFERENCES t_event_activities(id) ON DELETE CASCADE,
-    INDEX idx_activity_id (activity_id),
+    INDEX idx_activity_created (activity_id, created_at),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='AI任务结果表';
 
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构迁移脚本
+
+按版本号顺序执行尚未应用的迁移，已应用的版本记录在t_schema_migrations表中。
+DDL均以 ALGORITHM=INPLACE, LOCK=NONE 在线执行，迁移期间不阻塞业务读写。
+
+用法:
+    python migrate.py                # 执行所有未应用的迁移
+    python migrate.py --status       # 查看迁移状态
+    python migrate.py --check-plans  # 检查热点查询的执行计划是否使用预期索引
+
+执行计划与数据量有关，--check-plans 应在数据分布接近生产的库上运行。
+"""
+
+import argparse
+import sys
+import pymysql
+from utils.config import Config
+from utils.logging_config import setup_logging
+
+# 设置日志
+logger = setup_logging(log_level='INFO')
+
+# 迁移列表，按版本号顺序执行，新增迁移只能追加到末尾
+# 每个步骤为 (类型, 表名, 名称, 定义)：
+#   add_column - 定义为字段类型及约束
+#   add_index  - 定义为索引字段列表
+#   drop_index - 定义为None
+MIGRATIONS = [
+    {
+        'version': '0001',
+        'description': 'AI代理任务异步表增加任务领取和租约字段',
+        'steps': [
+            ('add_column', 't_ai_agent_task_async', 'owner', "VARCHAR(100) DEFAULT NULL COMMENT '领取任务的工作节点标识'"),
+            ('add_column', 't_ai_agent_task_async', 'lease_expires_at', "DATETIME DEFAULT NULL COMMENT '任务租约到期时间'")
+        ]
+    },
+    {
+        'version': '0002',
+        'description': '按热点查询增加组合索引',
+        'steps': [
+            ('add_index', 't_event_activities', 'idx_event_created', 'event_id, created_at'),
+            ('add_index', 't_ai_agent_task_async', 'idx_status_created', 'status, created_at'),
+            ('add_index', 't_event_artifacts', 'idx_activity_created', 'activity_id, created_at')
+        ]
+    },
+    {
+        'version': '0003',
+        'description': '删除已被组合索引覆盖的单列索引',
+        'steps': [
+            ('drop_index', 't_event_activities', 'idx_event_id', None),
+            ('drop_index', 't_ai_agent_task_async', 'idx_status', None),
+            ('drop_index', 't_event_artifacts', 'idx_activity_id', None)
+        ]
+    },
+    {
+        'version': '0004',
+        'description': 'AI代理任务异步表增加重试次数、下次执行时间和失败原因字段',
+        'steps': [
+            ('add_column', 't_ai_agent_task_async', 'attempts', "INT NOT NULL DEFAULT 0 COMMENT '已执行失败的次数'"),
+            ('add_column', 't_ai_agent_task_async', 'next_attempt_at', "DATETIME DEFAULT NULL COMMENT '下次允许执行的时间，为空时立即执行'"),
+            ('add_column', 't_ai_agent_task_async', 'last_error', "TEXT DEFAULT NULL COMMENT '最近一次执行失败的原因'")
+        ]
+    },
+    {
+        'version': '0005',
+        'description': 'AI代理任务异步表增加优先级字段及按优先级和app_id领取任务的索引',
+        'steps': [
+            ('add_column', 't_ai_agent_task_async', 'priority', "INT NOT NULL DEFAULT 0 COMMENT '任务优先级，数值越大越优先'"),
+            ('add_index', 't_ai_agent_task_async', 'idx_status_priority_app', 'status, priority, app_id, created_at')
+        ]
+    },
+    {
+        'version': '0006',
+        'description': 'AI代理任务异步表增加按状态和更新时间统计完成速度的索引',
+        'steps': [
+            ('add_index', 't_ai_agent_task_async', 'idx_status_updated', 'status, updated_at')
+        ]
+    },
+    {
+        'version': '0007',
+        'description': 'AI代理任务异步表增加链路上下文字段',
+        'steps': [
+            ('add_column', 't_ai_agent_task_async', 'trace_context', "VARCHAR(55) DEFAULT NULL COMMENT '创建任务的请求的链路上下文（W3C traceparent）'")
+        ]
+    },
+    {
+        'version': '0008',
+        'description': '领取任务的索引增加下次执行时间，统计和领取已到执行时间的任务时无需回表',
+        'steps': [
+            ('add_index', 't_ai_agent_task_async', 'idx_status_priority_app_due', 'status, priority, app_id, created_at, next_attempt_at'),
+            ('drop_index', 't_ai_agent_task_async', 'idx_status_priority_app', None)
+        ]
+    }
+]
+
+# 热点查询及其预期使用的索引（表名 -> 索引名），执行计划不符时 --check-plans 返回非0
+HOT_QUERIES = [
+    {
+        'name': '按工单分页查询AI任务列表',
+        'sql': """
+            SELECT id, task_id, status, title, created_at FROM t_event_activities
+            WHERE event_id = %s
+            ORDER BY created_at DESC, id DESC LIMIT 51
+        """,
+        'params': ('plan_check_event',),
+        'expected': {'t_event_activities': 'idx_event_created'}
+    },
+    {
+        'name': '统计各优先级、各app_id可领取的AI任务数',
+        'sql': """
+            SELECT priority, app_id, COUNT(id) FROM t_ai_agent_task_async
+            WHERE status = %s AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+            GROUP BY priority, app_id
+        """,
+        'params': ('init',),
+        'expected': {'t_ai_agent_task_async': 'idx_status_priority_app_due'}
+    },
+    {
+        'name': '领取待执行的AI任务',
+        'sql': """
+            SELECT id FROM t_ai_agent_task_async
+            WHERE status = %s AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+              AND priority = %s AND app_id = %s
+            ORDER BY created_at, id LIMIT 50
+        """,
+        'params': ('init', 0, 'plan_check_app'),
+        'expected': {'t_ai_agent_task_async': 'idx_status_priority_app_due'}
+    },
+    {
+        'name': '按工单分页查询AI任务结果',
+        'sql': """
+            SELECT t_event_artifacts.id, t_event_artifacts.created_at FROM t_event_artifacts
+            JOIN t_event_activities ON t_event_artifacts.activity_id = t_event_activities.id
+            WHERE t_event_activities.event_id = %s
+            ORDER BY t_event_artifacts.created_at, t_event_artifacts.id LIMIT 51
+        """,
+        'params': ('plan_check_event',),
+        'expected': {
+            't_event_activities': 'idx_event_created',
+            't_event_artifacts': 'idx_activity_created'
+        }
+    }
+]
+
+def get_connection():
+    """连接配置中的数据库"""
+    config = Config()
+    return pymysql.connect(
+        host=config.MYSQL_HOST,
+        port=config.MYSQL_PORT,
+        user=config.MYSQL_USER,
+        password=config.MYSQL_PASSWORD,
+        database=config.MYSQL_DATABASE,
+        charset='utf8mb4',
+        autocommit=True
+    )
+
+def ensure_migrations_table(cursor):
+    """创建迁移记录表"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS t_schema_migrations (
+            version VARCHAR(20) PRIMARY KEY COMMENT '迁移版本号',
+            description VARCHAR(200) NOT NULL COMMENT '迁移说明',
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '应用时间'
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据库迁移记录表'
+    """)
+
+def get_applied_versions(cursor):
+    """获取已应用的迁移版本"""
+    cursor.execute("SELECT version FROM t_schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def column_exists(cursor, table, column):
+    """判断字段是否已存在"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    return cursor.fetchone()[0] > 0
+
+def index_exists(cursor, table, index):
+    """判断索引是否已存在"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index)
+    )
+    return cursor.fetchone()[0] > 0
+
+def apply_step(cursor, step):
+    """
+    执行单个迁移步骤，目标已存在（如之前由create_tables.py创建）时跳过
+    
+    Args:
+        cursor: 数据库游标
+        step: (类型, 表名, 名称, 定义)
+    """
+    kind, table, name, definition = step
+    
+    if kind == 'add_column':
+        if column_exists(cursor, table, name):
+            logger.info(f"字段已存在，跳过: {table}.{name}")
+            return
+        sql = f"ALTER TABLE {table} ADD COLUMN {name} {definition}, ALGORITHM=INPLACE, LOCK=NONE"
+    elif kind == 'add_index':
+        if index_exists(cursor, table, name):
+            logger.info(f"索引已存在，跳过: {table}.{name}")
+            return
+        sql = f"ALTER TABLE {table} ADD INDEX {name} ({definition}), ALGORITHM=INPLACE, LOCK=NONE"
+    elif kind == 'drop_index':
+        if not index_exists(cursor, table, name):
+            logger.info(f"索引不存在，跳过: {table}.{name}")
+            return
+        sql = f"ALTER TABLE {table} DROP INDEX {name}, ALGORITHM=INPLACE, LOCK=NONE"
+    else:
+        raise ValueError(f"未知的迁移步骤类型: {kind}")
+    
+    logger.info(f"执行: {sql}")
+    cursor.execute(sql)
+
+def migrate():
+    """
+    执行所有未应用的迁移
+    
+    Returns:
+        bool: 是否全部执行成功
+    """
+    try:
+        connection = get_connection()
+        cursor = connection.cursor()
+        ensure_migrations_table(cursor)
+        applied = get_applied_versions(cursor)
+        
+        pending = [migration for migration in MIGRATIONS if migration['version'] not in applied]
+        if not pending:
+            logger.info("数据库结构已是最新版本")
+        
+        for migration in pending:
+            logger.info(f"正在应用迁移 {migration['version']}: {migration['description']}")
+            # MySQL的DDL会隐式提交，无法整体回滚；每个步骤可重复执行，失败后修复问题重新运行即可
+            for step in migration['steps']:
+                apply_step(cursor, step)
+            cursor.execute(
+                "INSERT INTO t_schema_migrations (version, description) VALUES (%s, %s)",
+                (migration['version'], migration['description'])
+            )
+            logger.info(f"迁移 {migration['version']} 应用成功")
+        
+        cursor.close()
+        connection.close()
+        return True
+    
+    except Exception as e:
+        logger.error(f"数据库迁移失败: {str(e)}")
+        return False
+
+def show_status():
+    """输出各迁移的应用状态"""
+    connection = get_connection()
+    cursor = connection.cursor()
+    ensure_migrations_table(cursor)
+    applied = get_applied_versions(cursor)
+    
+    for migration in MIGRATIONS:
+        state = '已应用' if migration['version'] in applied else '未应用'
+        logger.info(f"{migration['version']} [{state}] {migration['description']}")
+    
+    cursor.close()
+    connection.close()
+
+def check_plans():
+    """
+    检查热点查询的执行计划是否使用预期索引
+    
+    Returns:
+        bool: 全部符合预期时返回True
+    """
+    connection = get_connection()
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    ok = True
+    
+    for query in HOT_QUERIES:
+        cursor.execute("EXPLAIN " + query['sql'], query['params'])
+        plan = {row['table']: row for row in cursor.fetchall()}
+        
+        for table, expected_key in query['expected'].items():
+            row = plan.get(table)
+            actual_key = row['key'] if row else None
+            if actual_key == expected_key:
+                logger.info(f"[通过] {query['name']}: {table} 使用索引 {actual_key}")
+            else:
+                ok = False
+                access_type = row['type'] if row else None
+                logger.error(
+                    f"[失败] {query['name']}: {table} 预期使用索引 {expected_key}，"
+                    f"实际为 {actual_key}（访问类型: {access_type}）"
+                )
+    
+    cursor.close()
+    connection.close()
+    return ok
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='WeCodeSecTools 数据库结构迁移')
+    parser.add_argument('--status', action='store_true', help='查看迁移状态')
+    parser.add_argument('--check-plans', action='store_true', help='检查热点查询的执行计划，不符合预期时返回非0')
+    args = parser.parse_args()
+    
+    try:
+        if args.status:
+            show_status()
+        elif args.check_plans:
+            if not check_plans():
+                logger.error("存在未使用预期索引的热点查询")
+                sys.exit(1)
+        elif not migrate():
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"程序执行失败: {str(e)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,14 @@ from models.database import db
 class AIAgentTaskAsync(db.Model):
     """AI代理任务异步表"""
     __tablename__ = 't_ai_agent_task_async'
+    __table_args__ = (
+        # 调度器按created_at顺序领取待执行任务
+        db.Index('idx_status_created', 'status', 'created_at'),
+        # 按优先级和app_id统计和领取已到执行时间的待执行任务，next_attempt_at在索引内过滤，无需回表
+        db.Index('idx_status_priority_app_due', 'status', 'priority', 'app_id', 'created_at', 'next_attempt_at'),
+        # 统计近期完成的任务数，估算队列消化速度
+        db.Index('idx_status_updated', 'status', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='自增主键')
     task_id = db.Column(db.String(36), unique=True, nullable=False, comment='任务UUID')
@@ -17,8 +25,15 @@ class AIAgentTaskAsync(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
     task_content = db.Column(db.Text, nullable=False, comment='任务内容')
-    status = db.Column(db.String(20), default='init', comment='任务状态: init, running, complete')
+    status = db.Column(db.String(20), default='init', comment='任务状态: init, running, complete, failed')
     result = db.Column(db.Text, comment='任务结果（由AI返回结果填充）')
+    owner = db.Column(db.String(100), comment='领取任务的工作节点标识')
+    lease_expires_at = db.Column(db.DateTime, comment='任务租约到期时间')
+    attempts = db.Column(db.Integer, nullable=False, default=0, comment='已执行失败的次数')
+    next_attempt_at = db.Column(db.DateTime, comment='下次允许执行的时间，为空时立即执行')
+    last_error = db.Column(db.Text, comment='最近一次执行失败的原因')
+    priority = db.Column(db.Integer, nullable=False, default=0, comment='任务优先级，数值越大越优先')
+    trace_context = db.Column(db.String(55), comment='创建任务的请求的链路上下文（W3C traceparent）')
     
     def __repr__(self):
         return f'<AIAgentTaskAsync {self.task_id}>'
@@ -33,5 +48,12 @@ class AIAgentTaskAsync(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'task_content': self.task_content,
             'status': self.status,
-            'result': self.result
+            'result': self.result,
+            'owner': self.owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'priority': self.priority,
+            'trace_context': self.trace_context
         }
@@ -10,6 +10,10 @@ from models.database import db
 class EventActivity(db.Model):
     """工单活动表"""
     __tablename__ = 't_event_activities'
+    __table_args__ = (
+        # 按工单分页查询AI任务列表
+        db.Index('idx_event_created', 'event_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='自增主键')
     event_id = db.Column(db.String(100), nullable=False, comment='工单ID')
@@ -18,26 +22,29 @@ class EventActivity(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
     task_content = db.Column(db.Text, nullable=False, comment='任务内容')
-    status = db.Column(db.String(20), default='init', comment='任务状态: init, running, complete')
+    status = db.Column(db.String(20), default='init', comment='任务状态: init, running, complete, failed')
     title = db.Column(db.String(500), comment='任务标题（由AI返回结果填充）')
     description = db.Column(db.Text, comment='任务描述（由AI返回结果填充）')
     result = db.Column(db.Text, comment='任务结果（由AI返回结果填充）')
     
+    # to_dict可输出的字段，也是fields参数允许的取值
+    FIELDS = (
+        'id', 'event_id', 'task_id', 'app_id', 'created_at', 'updated_at',
+        'task_content', 'status', 'title', 'description', 'result'
+    )
+    
     def __repr__(self):
         return f'<EventActivity {self.task_id}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
-            'id': self.id,
-            'event_id': self.event_id,
-            'task_id': self.task_id,
-            'app_id': self.app_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'task_content': self.task_content,
-            'status': self.status,
-            'title': self.title,
-            'description': self.description,
-            'result': self.result
-        }
+    def to_dict(self, fields=None):
+        """
+        转换为字典
+        
+        Args:
+            fields: 可选，只输出指定字段，未加载的延迟列不会被访问
+        """
+        data = {}
+        for name in fields or self.FIELDS:
+            value = getattr(self, name)
+            data[name] = value.isoformat() if isinstance(value, datetime) else value
+        return data
@@ -3,6 +3,10 @@ from models.database import db
 
 class EventArtifact(db.Model):
     __tablename__ = 't_event_artifacts'
+    __table_args__ = (
+        # 按AI任务关联查询结果并按创建时间分页
+        db.Index('idx_activity_created', 'activity_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     activity_id = db.Column(db.Integer, db.ForeignKey('t_event_activities.id'), nullable=False, comment='关联的AI任务ID')
@@ -14,14 +18,15 @@ class EventArtifact(db.Model):
         self.activity_id = activity_id
         self.artifact_data = artifact_data
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'activity_id': self.activity_id,
-            'artifact_data': self.artifact_data,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # to_dict可输出的字段，也是fields参数允许的取值
+    FIELDS = ('id', 'activity_id', 'artifact_data', 'created_at', 'updated_at')
+    
+    def to_dict(self, fields=None):
+        data = {}
+        for name in fields or self.FIELDS:
+            value = getattr(self, name)
+            data[name] = value.isoformat() if isinstance(value, datetime) else value
+        return data
     
     def __repr__(self):
         return f'<EventArtifact {self.id}>'
@@ -1,31 +1,61 @@
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from utils.logging_config import get_logger
+from utils.query_stats import query_scope
+from utils.task_notifier import task_notifier
 
 logger = get_logger(__name__)
 
 class TaskScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
+        self.app = None
         self.ai_task_service = None  # 延迟初始化
+        self.dispatcher_thread = None
+        self.stopping = threading.Event()
+        self._init_lock = threading.Lock()
     
     def _init_services(self):
-        """初始化服务，在应用上下文中调用"""
-        if self.ai_task_service is None:
-            from services.ai_task_service import AITaskService
-            self.ai_task_service = AITaskService()
+        """初始化服务，在应用上下文中调用；分发线程和定时任务可能同时调用"""
+        with self._init_lock:
+            if self.ai_task_service is None:
+                from services.ai_task_service import AITaskService
+                self.ai_task_service = AITaskService()
     
-    def start(self):
+    def start(self, app):
         """
-        启动定时任务调度器
+        启动定时任务调度器和AI任务分发线程
+        
+        Args:
+            app: Flask应用实例，定时任务在其应用上下文中执行
         """
         try:
-            # 添加定时任务，每10秒执行一次
+            self.app = app
+            self.stopping.clear()
+            
+            # 跨进程唤醒：任务由其他进程创建时通过UDP报文通知本进程
+            if app.config['SCHEDULER_WAKEUP_LISTEN']:
+                try:
+                    task_notifier.start_listener(app.config['SCHEDULER_WAKEUP_LISTEN'])
+                except OSError as e:
+                    logger.warning("任务唤醒监听启动失败，仅依赖轮询发现新任务: %s", e)
+            
+            # 启动AI任务分发线程
+            self.dispatcher_thread = threading.Thread(
+                target=self._dispatch_loop,
+                name='ai-task-dispatcher',
+                daemon=True
+            )
+            self.dispatcher_thread.start()
+            
+            # 定期回收租约过期的任务
             self.scheduler.add_job(
-                func=self.process_pending_tasks,
-                trigger=IntervalTrigger(seconds=10),
-                id='process_ai_tasks',
-                name='处理待执行的AI任务',
+                func=self.reap_expired_tasks,
+                trigger='interval',
+                seconds=app.config['SCHEDULER_REAPER_INTERVAL'],
+                id='reap_expired_tasks',
+                max_instances=1,
+                coalesce=True,
                 replace_existing=True
             )
             
@@ -34,34 +64,93 @@ class TaskScheduler:
             logger.info("定时任务调度器启动成功")
             
         except Exception as e:
-            logger.error(f"启动定时任务调度器失败: {str(e)}")
+            logger.error("启动定时任务调度器失败: %s", e)
     
     def stop(self):
         """
-        停止定时任务调度器
+        停止定时任务调度器和AI任务分发线程
         """
         try:
             if self.scheduler.running:
                 self.scheduler.shutdown()
+                
+                self.stopping.set()
+                task_notifier.wake()
+                if self.dispatcher_thread:
+                    self.dispatcher_thread.join()
+                task_notifier.stop_listener()
+                
+                if self.ai_task_service:
+                    self.ai_task_service.shutdown()
                 logger.info("定时任务调度器已停止")
         except Exception as e:
-            logger.error(f"停止定时任务调度器失败: {str(e)}")
+            logger.error("停止定时任务调度器失败: %s", e)
+    
+    def _dispatch_loop(self):
+        """
+        AI任务分发线程
+        
+        创建任务时的通知会立即唤醒本线程处理；没有通知时按轮询间隔兜底检查，
+        队列持续为空时轮询间隔逐步翻倍，直到max_interval，发现任务或收到通知后恢复初始间隔。
+        """
+        base_interval = self.app.config['SCHEDULER_INTERVAL']
+        max_interval = self.app.config['SCHEDULER_MAX_INTERVAL']
+        max_tasks_per_tick = self.app.config['SCHEDULER_MAX_TASKS_PER_TICK']
+        # 启动后立即检查一次积压的任务
+        interval = 0
+        
+        while not self.stopping.is_set():
+            notified = task_notifier.wait(interval)
+            if self.stopping.is_set():
+                break
+            
+            processed = self.process_pending_tasks()
+            
+            if processed >= max_tasks_per_tick:
+                # 本轮达到处理上限，队列中可能还有任务，立即继续
+                interval = 0
+            elif processed or notified:
+                interval = base_interval
+            else:
+                interval = min(max(interval, base_interval) * 2, max_interval)
     
     def process_pending_tasks(self):
         """
         处理待执行的AI任务
+        
+        Returns:
+            int: 本次处理的任务数
         """
         try:
-            # 确保服务已初始化
-            self._init_services()
-            
-            if self.ai_task_service:
-                logger.debug("开始执行定时任务：处理待执行的AI任务")
-                self.ai_task_service.process_pending_tasks()
-            else:
-                logger.warning("AI任务服务未初始化，跳过定时任务执行")
+            with self.app.app_context():
+                # 确保服务已初始化
+                self._init_services()
+                
+                if self.ai_task_service:
+                    logger.debug("开始执行定时任务：处理待执行的AI任务")
+                    with query_scope('tick', 'process_pending_tasks'):
+                        return self.ai_task_service.process_pending_tasks(should_stop=self.stopping.is_set)
+                else:
+                    logger.warning("AI任务服务未初始化，跳过定时任务执行")
+        except Exception as e:
+            logger.error("执行定时任务异常: %s", e)
+        return 0
+
+    def reap_expired_tasks(self):
+        """
+        回收租约过期的AI任务
+        
+        Returns:
+            int: 回收的任务数
+        """
+        try:
+            with self.app.app_context():
+                self._init_services()
+                with query_scope('tick', 'reap_expired_tasks'):
+                    return self.ai_task_service.reap_expired_tasks()
         except Exception as e:
-            logger.error(f"执行定时任务异常: {str(e)}")
+            logger.error("执行回收任务异常: %s", e)
+        return 0
 
 # 全局调度器实例
 task_scheduler = TaskScheduler()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI任务准入控制模块
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from models.database import db
+from models.ai_agent_task import AIAgentTaskAsync
+
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+class AdmissionRejectedError(Exception):
+    """队列积压或执行中的任务超过上限，拒绝创建新任务"""
+    
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{reason}，建议 {retry_after:.0f} 秒后重试")
+
+class AdmissionController:
+    """
+    AI任务准入控制
+    
+    创建任务前检查全局和单个app_id的待执行任务数（init）与执行中任务数（running），超过上限时拒绝，
+    并按最近一段时间的任务完成速度估算积压消化到上限以下所需的时间作为Retry-After。
+    队列统计按stats_ttl缓存，缓存期内本进程接收的任务计入统计，避免每次创建任务都扫描队列。
+    """
+    
+    def __init__(self, enabled=True, max_queue_depth=0, max_app_queue_depth=0, max_in_flight=0,
+                 max_app_in_flight=0, drain_window_seconds=300, stats_ttl=2,
+                 min_retry_after=1, max_retry_after=600):
+        self.enabled = enabled
+        self.max_queue_depth = max_queue_depth
+        self.max_app_queue_depth = max_app_queue_depth
+        self.max_in_flight = max_in_flight
+        self.max_app_in_flight = max_app_in_flight
+        self.drain_window_seconds = drain_window_seconds
+        self.stats_ttl = stats_ttl
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self._depth = None
+        self._depth_at = 0.0
+        self._depth_refreshing = False
+        self._drain = None
+        self._drain_at = 0.0
+        self.admitted = 0
+        self.rejected = 0
+    
+    def _refresh_depth(self):
+        """
+        各app_id的待执行和执行中任务数超过stats_ttl时重新查询，在锁外执行
+        
+        同一时间只有一个线程查询，其他线程继续使用旧的统计；尚无统计时各线程都查询。
+        """
+        with self._lock:
+            if self._depth is not None and (self._depth_refreshing or time.monotonic() - self._depth_at < self.stats_ttl):
+                return
+            self._depth_refreshing = True
+        
+        try:
+            depth = {'init': {}, 'running': {}}
+            for status, app_id, count in db.session.query(
+                AIAgentTaskAsync.status, AIAgentTaskAsync.app_id, func.count(AIAgentTaskAsync.id)
+            ).filter(
+                AIAgentTaskAsync.status.in_(['init', 'running'])
+            ).group_by(AIAgentTaskAsync.status, AIAgentTaskAsync.app_id).all():
+                depth[status][app_id] = count
+            
+            with self._lock:
+                self._depth = depth
+                self._depth_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._depth_refreshing = False
+    
+    def _get_drain_rates(self):
+        """获取最近drain_window_seconds内各app_id每秒完成（含最终失败）的任务数，按stats_ttl缓存"""
+        now = time.monotonic()
+        if self._drain is None or now - self._drain_at >= self.stats_ttl:
+            since = datetime.utcnow() - timedelta(seconds=self.drain_window_seconds)
+            rates = {
+                app_id: count / self.drain_window_seconds
+                for app_id, count in db.session.query(
+                    AIAgentTaskAsync.app_id, func.count(AIAgentTaskAsync.id)
+                ).filter(
+                    AIAgentTaskAsync.status.in_(['complete', 'failed']),
+                    AIAgentTaskAsync.updated_at >= since
+                ).group_by(AIAgentTaskAsync.app_id).all()
+            }
+            self._drain = rates
+            self._drain_at = now
+        return self._drain
+    
+    def _retry_after(self, excess, app_id=None):
+        """
+        估算消化excess个任务所需的秒数
+        
+        Args:
+            excess: 需要消化的任务数
+            app_id: 按该app_id的完成速度估算，为None时按全局完成速度估算
+        """
+        rates = self._get_drain_rates()
+        rate = rates.get(app_id, 0) if app_id is not None else sum(rates.values())
+        if rate <= 0:
+            return self.max_retry_after
+        return min(max(math.ceil(excess / rate), self.min_retry_after), self.max_retry_after)
+    
+    def admit(self, app_id):
+        """
+        检查是否允许为app_id创建新任务，允许时计入本进程的统计
+        
+        Args:
+            app_id: 应用ID
+        
+        Raises:
+            AdmissionRejectedError: 超过准入上限
+        """
+        if not self.enabled:
+            return
+        
+        # 查询数据库在锁外完成，锁内只检查和更新计数
+        self._refresh_depth()
+        
+        with self._lock:
+            queued = self._depth['init']
+            running = self._depth['running']
+            checks = [
+                (sum(queued.values()), self.max_queue_depth, None, '待执行的AI任务已达上限'),
+                (queued.get(app_id, 0), self.max_app_queue_depth, app_id, f'应用 {app_id} 待执行的AI任务已达上限'),
+                (sum(running.values()), self.max_in_flight, None, '执行中的AI任务已达上限'),
+                (running.get(app_id, 0), self.max_app_in_flight, app_id, f'应用 {app_id} 执行中的AI任务已达上限')
+            ]
+            
+            rejection = next(((value - limit + 1, scope, reason) for value, limit, scope, reason in checks
+                              if limit and value >= limit), None)
+            if rejection is None:
+                queued[app_id] = queued.get(app_id, 0) + 1
+                self.admitted += 1
+                return
+            self.rejected += 1
+        
+        # Retry-After按完成速度估算，同样需要查询数据库
+        excess, scope, reason = rejection
+        raise AdmissionRejectedError(reason, self._retry_after(excess, scope))
+    
+    def stats(self):
+        """
+        获取准入控制统计信息
+        
+        Returns:
+            dict: 是否启用、接收和拒绝的任务数
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+def get_admission_controller(config):
+    """
+    获取进程内共享的准入控制器，首次调用时按配置创建
+    
+    Args:
+        config: Flask应用配置
+    
+    Returns:
+        AdmissionController: 准入控制器实例
+    """
+    global _admission_controller
+    
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController(
+                    enabled=config['ADMISSION_ENABLED'],
+                    max_queue_depth=config['ADMISSION_MAX_QUEUE_DEPTH'],
+                    max_app_queue_depth=config['ADMISSION_MAX_APP_QUEUE_DEPTH'],
+                    max_in_flight=config['ADMISSION_MAX_IN_FLIGHT'],
+                    max_app_in_flight=config['ADMISSION_MAX_APP_IN_FLIGHT'],
+                    drain_window_seconds=config['ADMISSION_DRAIN_WINDOW_SECONDS'],
+                    stats_ttl=config['ADMISSION_STATS_TTL'],
+                    min_retry_after=config['ADMISSION_MIN_RETRY_AFTER'],
+                    max_retry_after=config['ADMISSION_MAX_RETRY_AFTER']
+                )
+    
+    return _admission_controller
+
+def get_admission_stats():
+    """
+    获取共享准入控制器的统计信息，尚未创建时返回None
+    """
+    if _admission_controller is None:
+        return None
+    return _admission_controller.stats()
@@ -4,22 +4,137 @@
 AI任务服务
 """
 
+import os
+import random
+import socket
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import load_only
 from models.database import db
 from models.event_activity import EventActivity
 from models.event_artifact import EventArtifact
 from models.ai_agent_task import AIAgentTaskAsync
+from services.admission_control import AdmissionRejectedError, get_admission_controller
+from services.fair_queue import DeficitRoundRobin
 from services.ticket_service import TicketService
+from utils.circuit_breaker import CircuitOpenError
 from utils.logging_config import get_logger
+from utils.metrics import gauge, histogram
+from utils.rate_limiter import RateLimitTimeout
+from utils.task_notifier import task_notifier
+from utils.tracing import to_unix_nano, tracer
 
 logger = get_logger(__name__)
 
+# 任务等待和执行耗时可能达到小时级，分桶范围大于请求耗时
+TASK_LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600, 10800, 43200)
+
+queue_depth = gauge('wecode_ai_task_queue_depth', '各状态的AI任务数', ['status'])
+oldest_pending_age = gauge('wecode_ai_task_oldest_pending_age_seconds', '最早的待执行AI任务已等待的时长')
+claim_age = histogram('wecode_ai_task_claim_age_seconds', 'AI任务从创建到被领取的等待时长', buckets=TASK_LATENCY_BUCKETS)
+ai_call_duration = histogram('wecode_ai_call_duration_seconds', 'AI接口调用耗时', ['mode', 'outcome'])
+task_e2e_duration = histogram(
+    'wecode_ai_task_e2e_duration_seconds', 'AI任务从创建到完成或最终失败的时长', ['status'], buckets=TASK_LATENCY_BUCKETS
+)
+
+class AICallRecord:
+    """
+    一次AI接口调用的追踪span和耗时指标，线程和异步两种执行方式共用
+    
+    创建时开始计时并恢复任务创建请求的追踪上下文，finish时按结果区分outcome、记录耗时并结束span。
+    """
+    
+    def __init__(self, task, mode):
+        self.task = task
+        self.mode = mode
+        self.span = tracer.resume_span('ai_task.call_ai_api', task.trace_context, kind='client', attributes={
+            'task_id': task.task_id,
+            'attempt': task.attempts + 1,
+            'mode': mode
+        })
+        self.start = time.monotonic()
+        logger.info("开始处理任务 %s", task.task_id)
+    
+    def finish(self, api_result=None, error=None):
+        """
+        结束本次调用的记录
+        
+        Args:
+            api_result: AI API返回结果
+            error: 调用抛出的异常，成功时为None
+            
+        Returns:
+            tuple: (AI API返回结果, 异常)，成功时异常为None，失败时结果为None
+        """
+        if error is None:
+            if api_result:
+                outcome = 'success'
+            else:
+                outcome = 'error'
+                self.span.set_error('AI接口未返回结果')
+        elif isinstance(error, CircuitOpenError):
+            logger.warning("任务 %s 未执行: %s", self.task.task_id, error)
+            outcome = 'circuit_open'
+        elif isinstance(error, RateLimitTimeout):
+            # 未调用AI接口，由结果写回统一记录重新排队的任务数
+            outcome = 'rate_limited'
+        else:
+            logger.error("处理任务 %s 异常: %s", self.task.task_id, error)
+            self.span.set_error(error)
+            outcome = 'error'
+        
+        ai_call_duration.observe(time.monotonic() - self.start, self.mode, outcome)
+        self.span.set_attribute('outcome', outcome)
+        self.span.end()
+        return (api_result, None) if error is None else (None, error)
+
+def collect_queue_metrics():
+    """查询队列中待执行和执行中的任务数，更新队列指标，在输出指标前调用"""
+    counts = dict(db.session.query(AIAgentTaskAsync.status, func.count(AIAgentTaskAsync.id)).filter(
+        AIAgentTaskAsync.status.in_(['init', 'running'])
+    ).group_by(AIAgentTaskAsync.status).all())
+    queue_depth.replace({(status,): counts.get(status, 0) for status in ('init', 'running')})
+    
+    oldest = db.session.query(func.min(AIAgentTaskAsync.created_at)).filter(
+        AIAgentTaskAsync.status == 'init'
+    ).scalar()
+    oldest_pending_age.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+
 class AITaskService:
     def __init__(self):
         self.ticket_service = TicketService()
+        self.workers = current_app.config['SCHEDULER_WORKERS']
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix='ai-task-worker'
+        )
+        # 工作节点标识，用于区分多实例/多进程领取的任务
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = current_app.config['SCHEDULER_LEASE_SECONDS']
+        self.skip_locked = current_app.config['SCHEDULER_SKIP_LOCKED']
+        self.batch_size = current_app.config['SCHEDULER_BATCH_SIZE']
+        self.max_tasks_per_tick = current_app.config['SCHEDULER_MAX_TASKS_PER_TICK']
+        self.mode = current_app.config['SCHEDULER_MODE']
+        self.async_concurrency = current_app.config['SCHEDULER_ASYNC_CONCURRENCY']
+        # 同时在途的AI调用数上限，领取的任务都能立即开始执行，不在线程池队列中占用租约
+        self.max_in_flight = self.async_concurrency if self.mode == 'async' else self.workers
+        self.max_attempts = current_app.config['SCHEDULER_MAX_ATTEMPTS']
+        self.retry_base_seconds = current_app.config['SCHEDULER_RETRY_BASE_SECONDS']
+        self.retry_max_seconds = current_app.config['SCHEDULER_RETRY_MAX_SECONDS']
+        self.stale_running_seconds = current_app.config['SCHEDULER_STALE_RUNNING_SECONDS']
+        self.app_default_weight = current_app.config['SCHEDULER_APP_DEFAULT_WEIGHT']
+        self.app_default_max_running = current_app.config['SCHEDULER_APP_DEFAULT_MAX_RUNNING']
+        self.app_policies = current_app.config['SCHEDULER_APP_POLICIES']
+        self.fair_queues = {}  # 每个优先级一个按app_id轮询的调度器
+        self.admission = get_admission_controller(current_app.config)
+        self.async_engine = None  # async模式下首次处理任务时创建
     
-    def create_ai_task(self, event_id, app_id, task_content):
+    def create_ai_task(self, event_id, app_id, task_content, priority=0):
         """
         创建AI任务
         
@@ -27,11 +142,18 @@ class AITaskService:
             event_id: 工单ID
             app_id: 应用ID
             task_content: 任务内容
+            priority: 任务优先级，数值越大越优先
             
         Returns:
             dict: 创建的任务信息
+        
+        Raises:
+            AdmissionRejectedError: 队列积压超过准入上限
         """
         try:
+            # 队列积压超过上限时直接拒绝，不再写入数据库
+            self.admission.admit(app_id)
+            
             # 生成任务ID
             task_id = str(uuid.uuid4())
             
@@ -49,7 +171,9 @@ class AITaskService:
                 task_id=task_id,
                 app_id=app_id,
                 task_content=task_content,
-                status='init'
+                status='init',
+                priority=priority,
+                trace_context=tracer.current_traceparent()
             )
             
             # 保存到数据库
@@ -57,122 +181,692 @@ class AITaskService:
             db.session.add(ai_agent_task)
             db.session.commit()
             
-            logger.info(f"AI任务创建成功，task_id: {task_id}")
+            logger.info("AI任务创建成功，task_id: %s", task_id)
+            
+            # 通知任务分发线程立即处理，无需等待下一次轮询
+            task_notifier.notify()
             
             # 返回EventActivity记录
             return event_activity.to_dict()
             
+        except AdmissionRejectedError:
+            raise
         except Exception as e:
-            logger.error(f"创建AI任务失败: {str(e)}")
+            logger.error("创建AI任务失败: %s", e)
             db.session.rollback()
             return None
     
-    def get_activities_by_event_id(self, event_id):
+    def get_activities_by_event_id(self, event_id, limit, after=None, status=None, app_id=None, fields=None):
         """
-        根据工单ID获取AI任务列表
+        根据工单ID分页获取AI任务列表
+        
+        按(created_at, id)降序做键集分页，状态和应用ID过滤条件在SQL中完成，
+        多取一条用于判断是否还有下一页
         
         Args:
             event_id: 工单ID
+            limit: 每页条数
+            after: 上一页最后一条记录的(created_at, id)，为None时从最新一条开始
+            status: 可选，按任务状态过滤
+            app_id: 可选，按应用ID过滤
+            fields: 可选，只查询并返回指定字段，其余列不从数据库读取
             
         Returns:
-            list: AI任务列表
+            tuple: (AI任务列表, 下一页起点的(created_at, id)，没有下一页时为None)
         """
         try:
-            activities = EventActivity.query.filter_by(event_id=event_id).order_by(EventActivity.created_at.desc()).all()
-            return [activity.to_dict() for activity in activities]
+            query = EventActivity.query.filter(EventActivity.event_id == event_id)
+            if fields:
+                query = query.options(load_only(*(getattr(EventActivity, name) for name in fields)))
+            if status:
+                query = query.filter(EventActivity.status == status)
+            if app_id:
+                query = query.filter(EventActivity.app_id == app_id)
+            
+            if after is not None:
+                after_created_at, after_id = after
+                query = query.filter(or_(
+                    EventActivity.created_at < after_created_at,
+                    and_(EventActivity.created_at == after_created_at, EventActivity.id < after_id)
+                ))
+            
+            activities = query.order_by(
+                EventActivity.created_at.desc(), EventActivity.id.desc()
+            ).limit(limit + 1).all()
+            
+            next_key = None
+            if len(activities) > limit:
+                activities = activities[:limit]
+                next_key = (activities[-1].created_at, activities[-1].id)
+            
+            return [activity.to_dict(fields) for activity in activities], next_key
         except Exception as e:
-            logger.error(f"获取AI任务列表失败: {str(e)}")
-            return []
+            logger.error("获取AI任务列表失败: %s", e)
+            return [], None
     
-    def get_artifacts_by_event_id(self, event_id):
+    def get_artifacts_by_event_id(self, event_id, limit, after=None, fields=None):
         """
-        根据工单ID获取AI任务结果列表
+        根据工单ID分页获取AI任务结果列表
+        
+        通过JOIN t_event_activities一次查询完成，按(created_at, id)升序做键集分页，
+        多取一条用于判断是否还有下一页
         
         Args:
             event_id: 工单ID
+            limit: 每页条数
+            after: 上一页最后一条记录的(created_at, id)，为None时从第一条开始
+            fields: 可选，只查询并返回指定字段，其余列不从数据库读取
             
         Returns:
-            list: AI任务结果列表
+            tuple: (AI任务结果列表, 下一页起点的(created_at, id)，没有下一页时为None)
         """
         try:
-            # 先获取该工单的所有活动ID
-            activities = EventActivity.query.filter_by(event_id=event_id).all()
-            activity_ids = [activity.id for activity in activities]
+            query = EventArtifact.query.join(
+                EventActivity, EventArtifact.activity_id == EventActivity.id
+            ).filter(EventActivity.event_id == event_id)
+            if fields:
+                query = query.options(load_only(*(getattr(EventArtifact, name) for name in fields)))
+            
+            if after is not None:
+                after_created_at, after_id = after
+                query = query.filter(or_(
+                    EventArtifact.created_at > after_created_at,
+                    and_(EventArtifact.created_at == after_created_at, EventArtifact.id > after_id)
+                ))
+            
+            artifacts = query.order_by(
+                EventArtifact.created_at, EventArtifact.id
+            ).limit(limit + 1).all()
             
-            if not activity_ids:
-                return []
+            next_key = None
+            if len(artifacts) > limit:
+                artifacts = artifacts[:limit]
+                next_key = (artifacts[-1].created_at, artifacts[-1].id)
             
-            # 获取对应的结果
-            artifacts = EventArtifact.query.filter(EventArtifact.activity_id.in_(activity_ids)).all()
-            return [artifact.to_dict() for artifact in artifacts]
+            return [artifact.to_dict(fields) for artifact in artifacts], next_key
         except Exception as e:
-            logger.error(f"获取AI任务结果列表失败: {str(e)}")
-            return []
+            logger.error("获取AI任务结果列表失败: %s", e)
+            return [], None
     
-    def process_pending_tasks(self):
+    def process_pending_tasks(self, should_stop=None):
         """
         处理待执行的AI任务（定时任务）
+
+        按优先级和app_id公平调度领取待执行任务，分发到工作线程池或事件循环并发调用AI接口。
+        同时在途的任务数不超过max_in_flight，任务完成后立即写回结果（同时完成的任务在一个事务内写回），
+        空出的名额随即领取新任务补充，不等待同批的其他任务；执行期间收到新任务通知时重新统计可领取的任务，
+        有空闲名额即开始处理新任务。单次调度最多领取max_tasks_per_tick个任务，没有可领取的任务且在途任务全部写回后返回。
+        
+        Args:
+            should_stop: 可选的无参函数，返回True时停止领取新任务，在途任务写回后返回
+        
+        Returns:
+            int: 本次处理的任务数
         """
         try:
-            # 查询状态为init的AI代理任务
-            pending_tasks = AIAgentTaskAsync.query.filter_by(status='init').all()
+            app = current_app._get_current_object()
+            processed = 0
+            in_flight = {}  # Future -> 任务行
             
-            if not pending_tasks:
-                logger.debug("没有待执行的AI任务")
-                return
-            
-            logger.info(f"找到 {len(pending_tasks)} 个待执行的AI任务")
+            # 统计可领取的任务数，之后按实际领取的数量扣减，收到新任务通知后重新统计
+            generation = task_notifier.generation
+            ready, running = self._count_ready_tasks()
+            has_candidates = True
             
-            for task in pending_tasks:
-                try:
-                    # 更新状态为running
-                    task.status = 'running'
-                    task.updated_at = datetime.utcnow()
-                    db.session.commit()
-                    
-                    # 调用第三方API
-                    logger.info(f"开始处理任务 {task.task_id}")
-                    api_result = self.ticket_service.call_ai_api(task.task_content)
+            # 执行期间定期续租，避免耗时较长的任务被回收后重复调用AI接口
+            renewal_done = threading.Event()
+            renewer = threading.Thread(
+                target=self._renew_leases, args=(app, renewal_done), name='ai-task-lease-renewer', daemon=True
+            )
+            renewer.start()
+            try:
+                while True:
+                    stopping = should_stop and should_stop()
+                    if generation != task_notifier.generation and not stopping and \
+                            len(in_flight) < self.max_in_flight and processed < self.max_tasks_per_tick:
+                        generation = task_notifier.generation
+                        ready, running = self._count_ready_tasks()
+                        has_candidates = True
                     
-                    if api_result:
-                        # 更新任务状态为complete，并保存结果
-                        task.status = 'complete'
-                        task.result = str(api_result)
-                        task.updated_at = datetime.utcnow()
-                        
-                        # 同时更新EventActivity表
-                        event_activity = EventActivity.query.filter_by(task_id=task.task_id).first()
-                        if event_activity:
-                            event_activity.status = 'complete'
-                            event_activity.title = api_result.get('title', '')
-                            event_activity.description = api_result.get('description', '')
-                            event_activity.result = api_result.get('result', '')
-                            event_activity.updated_at = datetime.utcnow()
+                    # 领取的任务数不超过AI接口限流器在等待超时内还能发放的令牌数，避免领取的任务等不到令牌；
+                    # 已在等待令牌的在途任务由限流器扣除，本轮领取的任务随领取扣减
+                    capacity = self.ticket_service.rate_limit_capacity('ai')
+                    while has_candidates and processed < self.max_tasks_per_tick and not stopping:
+                        limit = min(self.max_in_flight - len(in_flight), self.batch_size, self.max_tasks_per_tick - processed)
+                        if limit < 1:
+                            break
                         
-                        # 保存到EventArtifacts表
-                        if event_activity:
-                            artifact = EventArtifact(
-                                activity_id=event_activity.id,
-                                artifact_data=api_result
-                            )
-                            db.session.add(artifact)
+                        # AI接口熔断期间暂停分发，待执行任务留在队列中
+                        if self.ticket_service.is_circuit_open('ai'):
+                            logger.warning("AI接口熔断中，暂停分发待执行的AI任务")
+                            has_candidates = False
+                            break
                         
-                        db.session.commit()
-                        logger.info(f"任务 {task.task_id} 处理完成")
-                    else:
-                        # API调用失败，重置状态为init
-                        task.status = 'init'
-                        task.updated_at = datetime.utcnow()
-                        db.session.commit()
-                        logger.warning(f"任务 {task.task_id} API调用失败，重置状态")
+                        if capacity is not None:
+                            limit = min(limit, capacity)
+                            if limit < 1:
+                                logger.debug("AI接口限流中，暂停领取待执行的AI任务")
+                                break
                         
-                except Exception as e:
-                    logger.error(f"处理任务 {task.task_id} 异常: {str(e)}")
-                    # 重置状态为init
-                    task.status = 'init'
-                    task.updated_at = datetime.utcnow()
-                    db.session.commit()
+                        task_ids, has_candidates = self._claim_pending_tasks(limit, ready, running)
+                        if task_ids:
+                            logger.info("领取到 %d 个待执行的AI任务", len(task_ids))
+                            for task in self._load_tasks(task_ids):
+                                future = self._submit(app, task)
+                                future.add_done_callback(lambda _: task_notifier.wake())
+                                in_flight[future] = task
+                            processed += len(task_ids)
+                            if capacity is not None:
+                                capacity -= len(task_ids)
+                    
+                    if not in_flight:
+                        break
+                    
+                    # 等待在途任务完成或新任务通知，超时只作兜底
+                    task_notifier.wait(1)
+                    done = [future for future in in_flight if future.done()]
+                    if not done:
+                        continue
+                    
+                    self._persist_results([(in_flight[future], *self._outcome(future)) for future in done])
+                    for future in done:
+                        app_id = in_flight.pop(future).app_id
+                        if app_id in running:
+                            running[app_id] -= 1
+                    
+                    # 释放本次写回的ORM对象
+                    db.session.remove()
+                    
+                    # 空出的名额可能使达到并发上限的app_id重新可以领取
+                    if not has_candidates and any(any(counts.values()) for counts in ready.values()):
+                        has_candidates = not self.ticket_service.is_circuit_open('ai')
+            finally:
+                renewal_done.set()
+                renewer.join()
+            
+            if processed:
+                logger.info("本次调度共处理 %d 个AI任务", processed)
+            else:
+                logger.debug("没有待执行的AI任务")
+            
+            return processed
                     
         except Exception as e:
-            logger.error(f"批量处理AI任务异常: {str(e)}")
+            logger.error("批量处理AI任务异常: %s", e)
             db.session.rollback()
+            return 0
+    
+    @staticmethod
+    def _due_filter(now):
+        """已到下次执行时间的待执行任务的过滤条件"""
+        return and_(
+            AIAgentTaskAsync.status == 'init',
+            or_(AIAgentTaskAsync.next_attempt_at.is_(None), AIAgentTaskAsync.next_attempt_at <= now)
+        )
+    
+    def _count_ready_tasks(self):
+        """
+        统计各优先级、各app_id可领取的任务数，以及各app_id正在执行的任务数
+        
+        两个查询均只扫描idx_status_priority_app_due、idx_status_created索引，每次调度执行一次，
+        不随领取批次数增加。
+        
+        Returns:
+            tuple: ({优先级: {app_id: 可领取的任务数}}, {app_id: 正在执行的任务数})，未配置并发上限时后者为空
+        """
+        ready = {}
+        for priority, app_id, count in db.session.query(
+            AIAgentTaskAsync.priority, AIAgentTaskAsync.app_id, func.count(AIAgentTaskAsync.id)
+        ).filter(self._due_filter(datetime.utcnow())).group_by(AIAgentTaskAsync.priority, AIAgentTaskAsync.app_id).all():
+            ready.setdefault(priority, {})[app_id] = count
+        
+        # 没有可领取任务的优先级的轮询状态已清空，释放其调度器
+        for priority in [priority for priority in self.fair_queues if priority not in ready]:
+            del self.fair_queues[priority]
+        
+        running = {}
+        if ready and self._get_fair_queue(0).has_limits():
+            running = dict(db.session.query(AIAgentTaskAsync.app_id, func.count(AIAgentTaskAsync.id)).filter(
+                AIAgentTaskAsync.status == 'running'
+            ).group_by(AIAgentTaskAsync.app_id).all())
+        
+        db.session.commit()
+        return ready, running
+    
+    def _claim_pending_tasks(self, limit, ready, running):
+        """
+        按优先级和app_id公平地原子领取一批待执行的AI任务
+        
+        只考虑已到下次执行时间的任务。优先级高的任务先领取；同一优先级内按app_id加权差额轮询分配
+        本批名额，受各app_id的并发上限限制，单个app_id批量提交大量任务时不会挤占其他app_id。
+        每个app_id按(created_at, id)顺序使用 SELECT ... FOR UPDATE SKIP LOCKED 锁定候选任务，
+        再以 status='init' 为条件更新为running，记录领取节点和租约到期时间。
+        多个实例同时领取时，同一任务只会被一个节点领取。
+        
+        Args:
+            limit: 本批最多领取的任务数
+            ready: _count_ready_tasks统计的可领取任务数，按本批锁定的任务数扣减
+            running: _count_ready_tasks统计的各app_id正在执行的任务数，按本批分配的任务数累加，
+                任务写回后由调用方扣减
+            
+        Returns:
+            tuple: (本节点领取成功的任务主键列表, 是否存在可领取的候选任务)
+        """
+        if not any(any(counts.values()) for counts in ready.values()):
+            return [], False
+        
+        now = datetime.utcnow()
+        due = self._due_filter(now)
+        candidate_ids = []
+        for priority in sorted(ready, reverse=True):
+            slots = limit - len(candidate_ids)
+            if slots <= 0:
+                break
+            
+            allocation = self._get_fair_queue(priority).allocate(ready[priority], running, slots)
+            for app_id, count in allocation.items():
+                running[app_id] = running.get(app_id, 0) + count
+                query = db.session.query(AIAgentTaskAsync.id).filter(
+                    due,
+                    AIAgentTaskAsync.priority == priority,
+                    AIAgentTaskAsync.app_id == app_id
+                ).order_by(AIAgentTaskAsync.created_at, AIAgentTaskAsync.id).limit(count)
+                if self.skip_locked:
+                    query = query.with_for_update(skip_locked=True)
+                ids = [row.id for row in query.all()]
+                candidate_ids.extend(ids)
+                # 锁定的任务少于分配数量时，该app_id本次调度已没有可领取的任务
+                ready[priority][app_id] = ready[priority][app_id] - count if len(ids) == count else 0
+        
+        if not candidate_ids:
+            # 有待执行任务但均已达到并发上限或被其他节点锁定
+            db.session.commit()
+            return [], False
+        
+        claimed = AIAgentTaskAsync.query.filter(
+            AIAgentTaskAsync.id.in_(candidate_ids),
+            AIAgentTaskAsync.status == 'init'
+        ).update({
+            AIAgentTaskAsync.status: 'running',
+            AIAgentTaskAsync.owner: self.owner,
+            AIAgentTaskAsync.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+            AIAgentTaskAsync.updated_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        if claimed == len(candidate_ids):
+            return candidate_ids, True
+        
+        # 部分任务已被其他节点领取，只保留本节点领取成功的任务
+        rows = db.session.query(AIAgentTaskAsync.id).filter(
+            AIAgentTaskAsync.id.in_(candidate_ids),
+            AIAgentTaskAsync.status == 'running',
+            AIAgentTaskAsync.owner == self.owner
+        ).order_by(AIAgentTaskAsync.created_at, AIAgentTaskAsync.id).all()
+        return [row.id for row in rows], True
+    
+    def _get_fair_queue(self, priority):
+        """获取指定优先级的app_id轮询调度器，首次调用时创建"""
+        if priority not in self.fair_queues:
+            self.fair_queues[priority] = DeficitRoundRobin(
+                default_weight=self.app_default_weight,
+                default_max_running=self.app_default_max_running,
+                policies=self.app_policies
+            )
+        return self.fair_queues[priority]
+    
+    def _load_tasks(self, task_ids):
+        """
+        查询已领取任务执行所需的字段，并记录领取等待时长和排队span
+        
+        Args:
+            task_ids: 已领取的AIAgentTaskAsync主键列表
+        
+        Returns:
+            list: 包含id、task_id、app_id、task_content、attempts、created_at、next_attempt_at、trace_context的任务行
+        """
+        tasks = db.session.query(
+            AIAgentTaskAsync.id, AIAgentTaskAsync.task_id, AIAgentTaskAsync.app_id, AIAgentTaskAsync.task_content,
+            AIAgentTaskAsync.attempts, AIAgentTaskAsync.created_at, AIAgentTaskAsync.next_attempt_at,
+            AIAgentTaskAsync.trace_context
+        ).filter(AIAgentTaskAsync.id.in_(task_ids)).order_by(
+            AIAgentTaskAsync.priority.desc(), AIAgentTaskAsync.created_at, AIAgentTaskAsync.id
+        ).all()
+        
+        now = datetime.utcnow()
+        for task in tasks:
+            claim_age.observe((now - task.created_at).total_seconds())
+            # 重试的任务从允许再次执行的时间开始计算排队等待
+            queued_at = max(task.created_at, task.next_attempt_at or task.created_at)
+            tracer.record_span('ai_task.queue_wait', task.trace_context, to_unix_nano(queued_at), to_unix_nano(now), {
+                'task_id': task.task_id,
+                'attempt': task.attempts + 1
+            })
+        return tasks
+    
+    def _submit(self, app, task):
+        """
+        开始调用AI接口处理一个任务，不等待完成
+        
+        Returns:
+            Future: 结果为(AI API返回结果, 异常)
+        """
+        if self.mode == 'async':
+            # 事件循环中以协程并发调用AI接口
+            return self._get_async_engine().submit(task)
+        # 工作线程只负责调用AI接口，使用各自独立的应用上下文
+        return self.executor.submit(self._call_ai_api_in_context, app, task)
+    
+    @staticmethod
+    def _outcome(future):
+        """取出已完成任务的(AI API返回结果, 异常)，执行被取消时返回取消异常"""
+        try:
+            return future.result()
+        except Exception as e:
+            return None, e
+    
+    def _renew_leases(self, app, done):
+        """
+        每隔lease_seconds的三分之一延长本节点执行中的任务的租约，直到done被设置
+        
+        Args:
+            app: Flask应用实例
+            done: 在途任务全部写回后设置的事件
+        """
+        with app.app_context():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    renewed = AIAgentTaskAsync.query.filter(
+                        AIAgentTaskAsync.status == 'running',
+                        AIAgentTaskAsync.owner == self.owner
+                    ).update({
+                        AIAgentTaskAsync.lease_expires_at: datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+                    }, synchronize_session=False)
+                    db.session.commit()
+                    logger.debug("续租 %d 个执行中的AI任务", renewed)
+                except Exception as e:
+                    logger.error("续租AI任务异常: %s", e)
+                    db.session.rollback()
+    
+    def _get_async_engine(self):
+        """获取异步执行引擎，首次调用时创建"""
+        if self.async_engine is None:
+            from services.async_task_engine import AsyncAITaskEngine
+            self.async_engine = AsyncAITaskEngine(
+                self.ticket_service,
+                concurrency=self.async_concurrency,
+                connect_timeout=current_app.config['THIRD_PARTY_API_CONNECT_TIMEOUT'],
+                read_timeout=current_app.config['THIRD_PARTY_API_READ_TIMEOUT']
+            )
+        return self.async_engine
+    
+    def _call_ai_api_in_context(self, app, task):
+        """
+        在工作线程中调用AI接口
+        
+        Args:
+            app: Flask应用实例
+            task: 包含id、task_id、task_content、attempts、trace_context的任务行
+            
+        Returns:
+            tuple: (AI API返回结果, 异常)，成功时异常为None，失败时结果为None
+        """
+        with app.app_context():
+            call = AICallRecord(task, 'thread')
+            try:
+                api_result = self.ticket_service.call_ai_api(task.task_content)
+            except Exception as e:
+                return call.finish(error=e)
+            return call.finish(api_result)
+    
+    def _persist_results(self, results):
+        """
+        在一个事务内批量写回一批任务的处理结果
+        
+        成功的任务更新AIAgentTaskAsync和EventActivity并批量插入EventArtifact；
+        调用失败的任务累加执行次数，按指数退避加随机抖动设置下次执行时间后重置为init，
+        达到max_attempts后置为failed不再重试；因熔断未实际调用的任务直接重置为init，
+        等待限流令牌超时的任务短暂延迟后重置为init，两者均未调用AI接口，不计入执行次数。
+        已不属于本节点的任务（例如租约过期后被其他节点重新领取）会被跳过；归属检查以 SELECT ... FOR UPDATE
+        锁定本节点仍持有的任务行直到提交，期间回收和重新领取无法修改这些任务，写回不会覆盖其他节点的领取。
+        
+        Args:
+            results: (任务行, AI API返回结果, 异常)列表，失败的任务结果为None
+        """
+        task_ids = [task.id for task, _, _ in results]
+        start_ns = time.time_ns()
+        try:
+            owned_ids = {row.id for row in db.session.query(AIAgentTaskAsync.id).filter(
+                AIAgentTaskAsync.id.in_(task_ids),
+                AIAgentTaskAsync.status == 'running',
+                AIAgentTaskAsync.owner == self.owner
+            ).with_for_update().all()}
+            results = [(task, api_result, error) for task, api_result, error in results if task.id in owned_ids]
+            
+            completed = [(task, api_result) for task, api_result, _ in results if api_result]
+            skipped = [task for task, api_result, error in results
+                       if not api_result and isinstance(error, CircuitOpenError)]
+            throttled = [(task, error) for task, api_result, error in results
+                         if not api_result and isinstance(error, RateLimitTimeout)]
+            failed = [(task, error) for task, api_result, error in results
+                      if not api_result and not isinstance(error, (CircuitOpenError, RateLimitTimeout))]
+            retrying = [(task, error) for task, error in failed if task.attempts + 1 < self.max_attempts]
+            dead = [(task, error) for task, error in failed if task.attempts + 1 >= self.max_attempts]
+            now = datetime.utcnow()
+            
+            # 一次IN查询取出对应的EventActivity
+            activity_ids = {}
+            finished_task_ids = [task.task_id for task, _ in completed] + [task.task_id for task, _ in dead]
+            if finished_task_ids:
+                activity_ids = dict(db.session.query(EventActivity.task_id, EventActivity.id).filter(
+                    EventActivity.task_id.in_(finished_task_ids)
+                ).all())
+            
+            retry_delays = {task.id: self._retry_delay(task.attempts + 1) for task, _ in retrying}
+            # 限流超时的任务在[retry_after/2, retry_after]内随机延迟，错开再次领取的时间
+            throttle_delays = {task.id: random.uniform(error.retry_after / 2, error.retry_after) for task, error in throttled}
+            
+            db.session.bulk_update_mappings(AIAgentTaskAsync, [{
+                'id': task.id,
+                'status': 'complete',
+                'result': str(api_result),
+                'lease_expires_at': None,
+                'updated_at': now
+            } for task, api_result in completed] + [{
+                'id': task.id,
+                'status': 'init',
+                'owner': None,
+                'lease_expires_at': None,
+                'attempts': task.attempts + 1,
+                'next_attempt_at': now + timedelta(seconds=retry_delays[task.id]),
+                'last_error': self._format_error(error),
+                'updated_at': now
+            } for task, error in retrying] + [{
+                'id': task.id,
+                'status': 'failed',
+                'owner': None,
+                'lease_expires_at': None,
+                'attempts': task.attempts + 1,
+                'next_attempt_at': None,
+                'last_error': self._format_error(error),
+                'updated_at': now
+            } for task, error in dead] + [{
+                'id': task.id,
+                'status': 'init',
+                'owner': None,
+                'lease_expires_at': None,
+                'updated_at': now
+            } for task in skipped] + [{
+                'id': task.id,
+                'status': 'init',
+                'owner': None,
+                'lease_expires_at': None,
+                'next_attempt_at': now + timedelta(seconds=throttle_delays[task.id]),
+                'updated_at': now
+            } for task, _ in throttled])
+            
+            db.session.bulk_update_mappings(EventActivity, [{
+                'id': activity_ids[task.task_id],
+                'status': 'complete',
+                'title': api_result.get('title', ''),
+                'description': api_result.get('description', ''),
+                'result': api_result.get('result', ''),
+                'updated_at': now
+            } for task, api_result in completed if task.task_id in activity_ids] + [{
+                'id': activity_ids[task.task_id],
+                'status': 'failed',
+                'updated_at': now
+            } for task, _ in dead if task.task_id in activity_ids])
+            
+            db.session.bulk_insert_mappings(EventArtifact, [{
+                'activity_id': activity_ids[task.task_id],
+                'artifact_data': api_result,
+                'created_at': now,
+                'updated_at': now
+            } for task, api_result in completed if task.task_id in activity_ids])
+            
+            db.session.commit()
+            
+            for task, _ in completed:
+                task_e2e_duration.observe((now - task.created_at).total_seconds(), 'complete')
+            for task, _ in dead:
+                task_e2e_duration.observe((now - task.created_at).total_seconds(), 'failed')
+            
+            self._trace_persist(start_ns, len(task_ids), [(task, 'complete') for task, _ in completed] +
+                                [(task, 'retry') for task, _ in retrying] +
+                                [(task, 'failed') for task, _ in dead] +
+                                [(task, 'skipped') for task in skipped] +
+                                [(task, 'throttled') for task, _ in throttled])
+            
+            for task, _ in completed:
+                logger.info("任务 %s 处理完成", task.task_id)
+            for task, error in retrying:
+                logger.warning(
+                    "任务 %s 第 %d 次执行失败，%.0f 秒后重试: %s",
+                    task.task_id, task.attempts + 1, retry_delays[task.id], self._format_error(error)
+                )
+            for task, error in dead:
+                logger.error("任务 %s 已失败 %d 次，不再重试: %s", task.task_id, task.attempts + 1, self._format_error(error))
+            if skipped:
+                logger.warning("%d 个任务因AI接口熔断未执行，重置状态", len(skipped))
+            if throttled:
+                logger.warning("%d 个任务等待AI接口限流令牌超时未执行，稍后重新排队", len(throttled))
+                
+        except Exception as e:
+            logger.error("批量保存AI任务结果异常: %s", e)
+            db.session.rollback()
+            self._release_tasks(task_ids)
+            self._trace_persist(start_ns, len(task_ids), [(task, 'error') for task, _, _ in results], error=e)
+    
+    def _trace_persist(self, start_ns, batch_size, outcomes, error=None):
+        """
+        在各任务的链路下记录结果写回的span，同一批任务共用一个事务，起止时间相同
+        
+        Args:
+            start_ns: 开始写回的时间（纳秒时间戳）
+            batch_size: 本批任务数
+            outcomes: (任务行, 写回结果)列表，写回结果为complete、retry、failed、skipped、throttled或error
+            error: 写回失败时的异常
+        """
+        end_ns = time.time_ns()
+        for task, outcome in outcomes:
+            span = tracer.resume_span('ai_task.persist', task.trace_context, start_ns=start_ns, attributes={
+                'task_id': task.task_id,
+                'attempt': task.attempts + 1,
+                'outcome': outcome,
+                'batch_size': batch_size
+            })
+            if error is not None:
+                span.set_error(error)
+            span.end(end_ns)
+    
+    def _retry_delay(self, attempts):
+        """
+        计算第attempts次失败后的重试等待秒数
+        
+        退避时长从retry_base_seconds开始每次翻倍，不超过retry_max_seconds，
+        并在[delay/2, delay]内随机取值，避免同时失败的任务在同一时刻集中重试
+        """
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+    
+    def _format_error(self, error):
+        """将失败原因转换为写入last_error的文本"""
+        if error is None:
+            return 'AI接口返回结果为空'
+        return f"{type(error).__name__}: {str(error)}"[:1000]
+    
+    def _release_tasks(self, task_ids):
+        """
+        将本节点领取的任务重置为init并释放租约
+        
+        Args:
+            task_ids: AIAgentTaskAsync主键列表
+        """
+        try:
+            AIAgentTaskAsync.query.filter(
+                AIAgentTaskAsync.id.in_(task_ids),
+                AIAgentTaskAsync.status == 'running',
+                AIAgentTaskAsync.owner == self.owner
+            ).update({
+                AIAgentTaskAsync.status: 'init',
+                AIAgentTaskAsync.owner: None,
+                AIAgentTaskAsync.lease_expires_at: None,
+                AIAgentTaskAsync.updated_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error("重置AI任务状态异常: %s", e)
+            db.session.rollback()
+    
+    def reap_expired_tasks(self):
+        """
+        回收中断的任务（定时任务）
+        
+        进程崩溃或重新部署时已领取的任务会一直停留在running状态。租约已过期，
+        或没有租约信息且超过stale_running_seconds未更新的running任务会被批量重置为init重新排队，
+        不计入执行次数。EventActivity在任务执行期间保持init，无需重置。原节点之后写回的结果会因owner不符被丢弃。
+        
+        Returns:
+            int: 回收的任务数
+        """
+        try:
+            now = datetime.utcnow()
+            expired = and_(
+                AIAgentTaskAsync.status == 'running',
+                or_(
+                    AIAgentTaskAsync.lease_expires_at < now,
+                    and_(
+                        AIAgentTaskAsync.lease_expires_at.is_(None),
+                        AIAgentTaskAsync.updated_at < now - timedelta(seconds=self.stale_running_seconds)
+                    )
+                )
+            )
+            
+            reaped = AIAgentTaskAsync.query.filter(expired).update({
+                AIAgentTaskAsync.status: 'init',
+                AIAgentTaskAsync.owner: None,
+                AIAgentTaskAsync.lease_expires_at: None,
+                AIAgentTaskAsync.last_error: '任务执行中断，租约过期后重新排队',
+                AIAgentTaskAsync.updated_at: now
+            }, synchronize_session=False)
+            db.session.commit()
+            
+            if reaped:
+                logger.warning("回收 %d 个中断的AI任务，已重新排队", reaped)
+                # 通知任务分发线程立即处理回收的任务
+                task_notifier.notify()
+            return reaped
+            
+        except Exception as e:
+            logger.error("回收中断的AI任务异常: %s", e)
+            db.session.rollback()
+            return 0
+    
+    def shutdown(self):
+        """
+        关闭工作线程池和异步执行引擎，等待正在执行的任务结束
+        """
+        self.executor.shutdown(wait=True)
+        if self.async_engine is not None:
+            self.async_engine.shutdown()
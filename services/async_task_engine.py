@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI任务异步执行引擎
+"""
+
+import asyncio
+import threading
+import aiohttp
+from services.ai_task_service import AICallRecord
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class AsyncAITaskEngine:
+    """
+    在独立事件循环线程中并发调用AI接口
+    
+    每个任务的AI调用作为一个协程提交到事件循环，同时在途的请求数由调用方控制在concurrency以内；
+    HTTP连接由长期持有的aiohttp.ClientSession复用，连接池上限同为concurrency。
+    """
+    
+    def __init__(self, ticket_service, concurrency=200, connect_timeout=3, read_timeout=30):
+        self.ticket_service = ticket_service
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.thread = threading.Thread(target=self._run_loop, name='ai-task-event-loop', daemon=True)
+        self.thread.start()
+    
+    def _run_loop(self):
+        """事件循环线程入口"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    async def _ensure_session(self):
+        """在事件循环中创建共享的HTTP会话"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=self.timeout
+            )
+    
+    def submit(self, task):
+        """
+        在事件循环中开始调用AI接口处理一个任务，不等待完成
+        
+        Args:
+            task: 包含task_id、task_content、attempts、trace_context的任务行
+        
+        Returns:
+            concurrent.futures.Future: 结果为(AI API返回结果, 异常)，成功时异常为None，失败时结果为None
+        """
+        return asyncio.run_coroutine_threadsafe(self._call_ai_api(task), self.loop)
+    
+    async def _call_ai_api(self, task):
+        """调用AI接口，返回(结果, 异常)"""
+        await self._ensure_session()
+        call = AICallRecord(task, 'async')
+        try:
+            api_result = await self.ticket_service.call_ai_api_async(self.session, task.task_content)
+        except Exception as e:
+            return call.finish(error=e)
+        return call.finish(api_result)
+    
+    def shutdown(self):
+        """关闭HTTP会话并停止事件循环"""
+        if self.session is not None:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按app_id公平分配任务的调度模块
+"""
+
+from collections import deque
+
+class DeficitRoundRobin:
+    """
+    按app_id加权的差额轮询（Deficit Round Robin）
+    
+    每轮为每个有待执行任务的app_id增加与其权重相等的额度，按额度的整数部分分配任务，
+    剩余额度留到下一轮；app_id的队列取空后额度清零，避免空闲时积累额度再集中占用。
+    每次分配从上次停止的位置继续轮询，各批次之间保持公平。
+    """
+    
+    def __init__(self, default_weight=1, default_max_running=0, policies=None):
+        """
+        Args:
+            default_weight: 未单独配置的app_id的权重
+            default_max_running: 未单独配置的app_id的并发上限，0表示不限制
+            policies: 按app_id单独配置的 {'weight': 权重, 'max_running': 并发上限}
+        """
+        self.default_weight = default_weight
+        self.default_max_running = default_max_running
+        self.policies = policies or {}
+        self.deficits = {}
+        self.order = deque()
+    
+    def weight(self, app_id):
+        """获取app_id的权重，至少为0.01以保证轮询能够推进"""
+        return max(self.policies.get(app_id, {}).get('weight', self.default_weight), 0.01)
+    
+    def max_running(self, app_id):
+        """获取app_id的并发上限，0表示不限制"""
+        return self.policies.get(app_id, {}).get('max_running', self.default_max_running)
+    
+    def has_limits(self):
+        """是否配置了并发上限"""
+        return bool(self.default_max_running) or any(
+            policy.get('max_running') for policy in self.policies.values()
+        )
+    
+    def _remaining(self, app_id, ready, running, allocation):
+        """app_id本批还可分配的任务数，受待执行任务数和并发上限限制"""
+        allocated = allocation.get(app_id, 0)
+        remaining = ready.get(app_id, 0) - allocated
+        limit = self.max_running(app_id)
+        if limit:
+            remaining = min(remaining, limit - running.get(app_id, 0) - allocated)
+        return remaining
+    
+    def allocate(self, ready, running, slots):
+        """
+        为一批任务按app_id分配领取数量
+        
+        Args:
+            ready: {app_id: 可领取的任务数}
+            running: {app_id: 正在执行的任务数}
+            slots: 本批最多领取的任务数
+        
+        Returns:
+            dict: {app_id: 领取数量}
+        """
+        # 队列已取空的app_id退出轮询并清零额度，新出现的app_id加入轮询末尾
+        for app_id in [app_id for app_id in self.order if not ready.get(app_id)]:
+            self.order.remove(app_id)
+            del self.deficits[app_id]
+        for app_id in ready:
+            if ready[app_id] and app_id not in self.deficits:
+                self.deficits[app_id] = 0
+                self.order.append(app_id)
+        
+        allocation = {}
+        while slots > 0 and any(self._remaining(app_id, ready, running, allocation) > 0 for app_id in self.order):
+            for _ in range(len(self.order)):
+                app_id = self.order[0]
+                remaining = self._remaining(app_id, ready, running, allocation)
+                if remaining > 0:
+                    self.deficits[app_id] += self.weight(app_id)
+                    take = min(int(self.deficits[app_id]), remaining, slots)
+                    if take:
+                        allocation[app_id] = allocation.get(app_id, 0) + take
+                        self.deficits[app_id] -= take
+                        slots -= take
+                    if allocation.get(app_id, 0) >= ready[app_id]:
+                        self.deficits[app_id] = 0
+                self.order.rotate(-1)
+                if slots == 0:
+                    break
+        
+        return allocation
@@ -1,9 +1,22 @@
-import requests
+import threading
+import time as time_module
 from flask import current_app
+from utils.cache import CACHE_FRESH, CACHE_STALE, get_cache
+from utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from utils.http_client import get_http_client
 from utils.logging_config import get_logger
+from utils.metrics import counter, histogram
+from utils.rate_limiter import RateLimitTimeout, get_rate_limiter
+from utils.singleflight import SingleFlight
 
 logger = get_logger(__name__)
 
+# 进程内共享，合并相同工单ID或相同列表查询的并发上游请求
+upstream_flight = SingleFlight()
+
+upstream_duration = histogram('wecode_upstream_request_duration_seconds', '第三方API调用耗时', ['endpoint'])
+upstream_requests = counter('wecode_upstream_requests_total', '第三方API调用次数', ['endpoint', 'outcome'])
+
 class TicketService:
     def __init__(self):
         self.base_url = current_app.config['THIRD_PARTY_API_BASE_URL']
@@ -12,10 +25,79 @@ class TicketService:
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        # 进程内共享的长连接池，超时和重试策略来自配置
+        self.http_client = get_http_client(current_app.config)
+        
+        # 进程内共享的出站限流器，按端点类别分别限流
+        self.rate_limit_enabled = current_app.config['RATE_LIMIT_ENABLED']
+        self.rate_limit_timeout = current_app.config['RATE_LIMIT_ACQUIRE_TIMEOUT']
+        self.rate_limiters = {
+            'tickets': self._get_rate_limiter('tickets', current_app.config['RATE_LIMIT_TICKETS']),
+            'ticket_detail': self._get_rate_limiter('ticket_detail', current_app.config['RATE_LIMIT_TICKET_DETAIL']),
+            'ai': self._get_rate_limiter('ai', current_app.config['RATE_LIMIT_AI'])
+        }
+        
+        # 进程内共享的熔断器，按端点类别分别统计
+        self.circuit_breaker_enabled = current_app.config['CIRCUIT_BREAKER_ENABLED']
+        self.circuit_breakers = {
+            name: self._get_circuit_breaker(name) for name in ('tickets', 'ticket_detail', 'ai')
+        }
+        
+        # 进程内共享的工单列表/详情缓存
+        self.cache_enabled = current_app.config['CACHE_ENABLED']
+        self.tickets_cache = get_cache(
+            'tickets',
+            max_entries=current_app.config['CACHE_MAX_ENTRIES'],
+            ttl=current_app.config['CACHE_TICKETS_TTL'],
+            stale_ttl=current_app.config['CACHE_STALE_TTL']
+        )
+        self.ticket_detail_cache = get_cache(
+            'ticket_detail',
+            max_entries=current_app.config['CACHE_MAX_ENTRIES'],
+            ttl=current_app.config['CACHE_TICKET_DETAIL_TTL'],
+            stale_ttl=current_app.config['CACHE_STALE_TTL']
+        )
     
-    def get_tickets(self, offset=1, size=10, status=None, time=None, keyword=None):
+    def get_tickets(self, offset=1, size=10, status=None, time=None, keyword=None, use_cache=True):
         """
         从第三方API获取工单列表
+        
+        Args:
+            use_cache: 是否使用缓存，为False时直接请求第三方API并刷新缓存
+        """
+        status = self._normalize_param(status)
+        time = self._normalize_param(time)
+        keyword = self._normalize_param(keyword)
+        
+        cache_key = (offset, size, status, time, keyword)
+        return self._cached_fetch(
+            self.tickets_cache,
+            cache_key,
+            lambda: self._fetch_tickets(offset, size, status, time, keyword),
+            use_cache
+        )
+    
+    def get_ticket_detail(self, ticket_id, use_cache=True):
+        """
+        从第三方API获取工单详情
+        
+        Args:
+            use_cache: 是否使用缓存，为False时直接请求第三方API并刷新缓存
+        """
+        return self._cached_fetch(
+            self.ticket_detail_cache,
+            str(ticket_id),
+            lambda: self._fetch_ticket_detail(ticket_id),
+            use_cache
+        )
+    
+    def _fetch_tickets(self, offset, size, status, time, keyword):
+        """
+        请求第三方API获取工单列表
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+            RateLimitTimeout: 等待令牌超时，未发出请求
         """
         try:
             params = {
@@ -30,44 +112,242 @@ class TicketService:
             if keyword:
                 params['keyword'] = keyword
             
-            response = requests.get(
-                f"{self.base_url}/tickets",
-                headers=self.headers,
-                params=params,
-                timeout=30
-            )
+            self._guard_circuit('tickets')
+            if not self._acquire_rate_limit('tickets'):
+                raise RateLimitTimeout('tickets', self.rate_limit_timeout)
+            
+            response = self._upstream_get('tickets', f"{self.base_url}/tickets", params=params)
             
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.error(f"获取工单列表失败: {response.status_code} - {response.text}")
+                logger.error("获取工单列表失败: %s - %s", response.status_code, response.text)
                 return None
                 
+        except (CircuitOpenError, RateLimitTimeout):
+            raise
         except Exception as e:
-            logger.error(f"获取工单列表异常: {str(e)}")
+            logger.error("获取工单列表异常: %s", e)
             return None
     
-    def get_ticket_detail(self, ticket_id):
+    def _fetch_ticket_detail(self, ticket_id):
         """
-        从第三方API获取工单详情
+        请求第三方API获取工单详情
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+            RateLimitTimeout: 等待令牌超时，未发出请求
         """
         try:
-            response = requests.get(
-                f"{self.base_url}/tickets/{ticket_id}",
-                headers=self.headers,
-                timeout=30
-            )
+            self._guard_circuit('ticket_detail')
+            if not self._acquire_rate_limit('ticket_detail'):
+                raise RateLimitTimeout('ticket_detail', self.rate_limit_timeout)
+            
+            response = self._upstream_get('ticket_detail', f"{self.base_url}/tickets/{ticket_id}")
             
             if response.status_code == 200:
                 return response.json()
             else:
-                logger.error(f"获取工单详情失败: {response.status_code} - {response.text}")
+                logger.error("获取工单详情失败: %s - %s", response.status_code, response.text)
                 return None
                 
+        except (CircuitOpenError, RateLimitTimeout):
+            raise
         except Exception as e:
-            logger.error(f"获取工单详情异常: {str(e)}")
+            logger.error("获取工单详情异常: %s", e)
             return None
     
+    def _cached_fetch(self, cache, key, fetch, use_cache):
+        """
+        带缓存的第三方API查询
+        
+        缓存新鲜时直接返回；缓存已过期但仍在stale窗口内时返回旧值并在后台刷新；
+        未命中或跳过缓存时同步请求，成功的结果写入缓存。
+        相同键的并发请求合并为一次上游调用，所有调用方共享其结果。
+        
+        Args:
+            cache: TTLCache实例
+            key: 缓存键
+            fetch: 请求第三方API的函数，失败时返回None
+            use_cache: 是否使用缓存
+        """
+        if self.cache_enabled and use_cache:
+            state, value = cache.get(key)
+            if state == CACHE_FRESH:
+                return value
+            if state == CACHE_STALE:
+                self._refresh_in_background(cache, key, fetch)
+                return value
+        
+        return self._coalesced_fetch(cache, key, fetch)
+    
+    def _coalesced_fetch(self, cache, key, fetch):
+        """
+        合并相同键的并发上游请求，由首个调用方请求并写入缓存，其余调用方共享结果
+        """
+        def fetch_and_store():
+            value = fetch()
+            if self.cache_enabled and value is not None:
+                cache.set(key, value)
+            return value
+        
+        return upstream_flight.do((cache.name, key), fetch_and_store)
+    
+    def _refresh_in_background(self, cache, key, fetch):
+        """
+        在后台线程中刷新过期的缓存条目，同一条目同时只有一个刷新线程
+        """
+        if not cache.begin_refresh(key):
+            return
+        
+        def refresh():
+            try:
+                self._coalesced_fetch(cache, key, fetch)
+            except (CircuitOpenError, RateLimitTimeout) as e:
+                logger.debug("后台刷新缓存跳过: %s", e)
+            except Exception as e:
+                logger.error("后台刷新缓存异常: %s", e)
+            finally:
+                cache.end_refresh(key)
+        
+        threading.Thread(target=refresh, name=f'{cache.name}-refresh', daemon=True).start()
+    
+    def _upstream_get(self, name, url, **kwargs):
+        """
+        经熔断器发起上游GET请求，记录调用结果并根据响应调整限流速率
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        self._allow_circuit(name)
+        start = time_module.monotonic()
+        try:
+            response = self.http_client.get(url, headers=self.headers, **kwargs)
+        except Exception:
+            duration = time_module.monotonic() - start
+            self._record_circuit(name, False, duration)
+            self._observe_upstream(name, duration, 'error')
+            raise
+        
+        duration = time_module.monotonic() - start
+        self._record_circuit(name, response.status_code < 500 and response.status_code != 429, duration)
+        self._observe_upstream(name, duration, f'{response.status_code // 100}xx')
+        self._observe_rate_limit(name, response)
+        return response
+    
+    @staticmethod
+    def _observe_upstream(name, duration, outcome):
+        """
+        记录上游调用耗时和结果
+        
+        Args:
+            name: 端点类别名称
+            duration: 调用耗时（秒）
+            outcome: 调用结果，HTTP状态码类别（如2xx、5xx）或error
+        """
+        upstream_duration.observe(duration, name)
+        upstream_requests.inc(name, outcome)
+    
+    @staticmethod
+    def _get_circuit_breaker(name):
+        """按配置获取共享熔断器"""
+        return get_circuit_breaker(
+            name,
+            window_size=current_app.config['CIRCUIT_BREAKER_WINDOW_SIZE'],
+            min_calls=current_app.config['CIRCUIT_BREAKER_MIN_CALLS'],
+            failure_rate_threshold=current_app.config['CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD'],
+            slow_call_seconds=current_app.config['CIRCUIT_BREAKER_SLOW_CALL_SECONDS'],
+            slow_call_rate_threshold=current_app.config['CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD'],
+            open_seconds=current_app.config['CIRCUIT_BREAKER_OPEN_SECONDS'],
+            half_open_max_calls=current_app.config['CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS']
+        )
+    
+    def _guard_circuit(self, name):
+        """熔断器打开时快速失败，不占用half_open试探名额"""
+        if self.circuit_breaker_enabled:
+            self.circuit_breakers[name].raise_if_open()
+    
+    def _allow_circuit(self, name):
+        """发起调用前检查熔断器，half_open状态下占用一个试探名额并返回其标识"""
+        if self.circuit_breaker_enabled:
+            return self.circuit_breakers[name].allow_request()
+        return None
+    
+    def _release_circuit(self, name, probe):
+        """归还未发起调用的half_open试探名额"""
+        if self.circuit_breaker_enabled:
+            self.circuit_breakers[name].release(probe)
+    
+    def _record_circuit(self, name, success, duration):
+        """记录调用结果"""
+        if self.circuit_breaker_enabled:
+            self.circuit_breakers[name].record(success, duration)
+    
+    def is_circuit_open(self, name):
+        """
+        指定端点类别的熔断器是否打开
+        
+        Args:
+            name: 端点类别，tickets、ticket_detail或ai
+        """
+        return self.circuit_breaker_enabled and self.circuit_breakers[name].is_open()
+    
+    @staticmethod
+    def _get_rate_limiter(name, limit_config):
+        """按端点类别配置获取共享限流器"""
+        return get_rate_limiter(
+            name,
+            max_rate=limit_config.get('rate', 10),
+            burst=limit_config.get('burst', 20),
+            min_rate=current_app.config['RATE_LIMIT_MIN_RATE'],
+            increase_step=current_app.config['RATE_LIMIT_INCREASE_STEP'],
+            decrease_factor=current_app.config['RATE_LIMIT_DECREASE_FACTOR']
+        )
+    
+    def _acquire_rate_limit(self, name):
+        """取得指定端点类别的令牌，限流关闭时直接放行"""
+        if not self.rate_limit_enabled:
+            return True
+        return self.rate_limiters[name].acquire(self.rate_limit_timeout)
+    
+    def rate_limit_capacity(self, name):
+        """
+        指定端点类别在等待令牌超时前最多能发出的请求数
+        
+        Args:
+            name: 端点类别，tickets、ticket_detail或ai
+        
+        Returns:
+            int: 请求数，限流关闭时返回None
+        """
+        if not self.rate_limit_enabled:
+            return None
+        return self.rate_limiters[name].capacity(self.rate_limit_timeout)
+    
+    def _observe_rate_limit(self, name, response):
+        """根据上游响应调整指定端点类别的速率"""
+        self.rate_limiters[name].observe(response.status_code, response.headers.get('Retry-After'))
+    
+    @staticmethod
+    def _normalize_param(value):
+        """规范化查询参数，去除首尾空白，空字符串视为未指定"""
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+    
+    def get_pool_stats(self):
+        """
+        获取连接池命中/未命中统计
+        """
+        return self.http_client.get_pool_stats()
+    
+    def get_coalescing_stats(self):
+        """
+        获取并发请求合并统计
+        """
+        return upstream_flight.stats()
+    
     def call_ai_api(self, task_content):
         """
         调用AI API
@@ -77,35 +357,126 @@ class TicketService:
             
         Returns:
             dict: AI API返回结果，包含title、description、result字段
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+            RateLimitTimeout: 等待令牌超时，未调用AI API
+            Exception: AI API调用失败，由调用方记录为任务的失败原因
         """
+        # 这里应该是调用真实的AI API
+        # 目前返回模拟数据
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            'task_content': task_content,
+            'model': 'gpt-4'  # 或其他AI模型
+        }
+        
+        # 先检查熔断器再等待令牌，熔断期间不消耗限流令牌
+        probe = self._allow_circuit('ai')
+        recorded = False
         try:
-            # 这里应该是调用真实的AI API
-            # 目前返回模拟数据
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
+            if not self._acquire_rate_limit('ai'):
+                raise RateLimitTimeout('ai', self.rate_limit_timeout)
             
-            data = {
-                'task_content': task_content,
-                'model': 'gpt-4'  # 或其他AI模型
-            }
+            start = time_module.monotonic()
             
             # 模拟API调用
-            # response = requests.post(f"{self.base_url}/ai/process", json=data, headers=headers)
+            # try:
+            #     response = self.http_client.post(f"{self.base_url}/ai/process", json=data, headers=headers)
+            # except Exception:
+            #     self._record_circuit('ai', False, time_module.monotonic() - start)
+            #     recorded = True
+            #     raise
+            # self._record_circuit('ai', response.status_code < 500 and response.status_code != 429, time_module.monotonic() - start)
+            # recorded = True
+            # self._observe_rate_limit('ai', response)
             # response.raise_for_status()
             # return response.json()
             
             # 返回模拟数据
-            mock_result = {
-                'title': f'AI分析结果: {task_content[:50]}...',
-                'description': f'基于任务内容"{task_content}"的详细分析描述',
-                'result': f'AI处理完成，任务内容: {task_content}。分析结果包括风险评估、建议措施等详细信息。'
-            }
+            mock_result = self._mock_ai_result(task_content)
+            duration = time_module.monotonic() - start
+            self._record_circuit('ai', True, duration)
+            recorded = True
+            self._observe_upstream('ai', duration, '2xx')
+            self.rate_limiters['ai'].on_success()
             
-            logger.info(f"AI API调用成功，任务内容: {task_content[:100]}...")
+            logger.info("AI API调用成功，任务内容: %.100s...", task_content)
             return mock_result
+        finally:
+            # 未记录调用结果就退出时（等待令牌超时或发起调用前抛出异常）归还试探名额
+            if not recorded:
+                self._release_circuit('ai', probe)
+    
+    async def call_ai_api_async(self, session, task_content):
+        """
+        异步调用AI API
+        
+        Args:
+            session: aiohttp.ClientSession，由异步执行引擎持有
+            task_content: 任务内容
             
-        except Exception as e:
-            logger.error(f"调用AI API异常: {str(e)}")
-            return None
+        Returns:
+            dict: AI API返回结果，包含title、description、result字段
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+            RateLimitTimeout: 等待令牌超时，未调用AI API
+            Exception: AI API调用失败，由调用方记录为任务的失败原因
+        """
+        # 这里应该是调用真实的AI API
+        # 目前返回模拟数据
+        # 先检查熔断器再等待令牌，熔断期间不消耗限流令牌
+        probe = self._allow_circuit('ai')
+        recorded = False
+        try:
+            if self.rate_limit_enabled and not await self.rate_limiters['ai'].acquire_async(self.rate_limit_timeout):
+                raise RateLimitTimeout('ai', self.rate_limit_timeout)
+            
+            start = time_module.monotonic()
+            
+            # 模拟API调用
+            # data = {
+            #     'task_content': task_content,
+            #     'model': 'gpt-4'  # 或其他AI模型
+            # }
+            # try:
+            #     async with session.post(f"{self.base_url}/ai/process", json=data, headers=self.headers) as response:
+            #         self._record_circuit('ai', response.status < 500 and response.status != 429, time_module.monotonic() - start)
+            #         recorded = True
+            #         self.rate_limiters['ai'].observe(response.status, response.headers.get('Retry-After'))
+            #         response.raise_for_status()
+            #         return await response.json()
+            # except aiohttp.ClientError:
+            #     if not recorded:
+            #         self._record_circuit('ai', False, time_module.monotonic() - start)
+            #         recorded = True
+            #     raise
+            
+            # 返回模拟数据
+            mock_result = self._mock_ai_result(task_content)
+            duration = time_module.monotonic() - start
+            self._record_circuit('ai', True, duration)
+            recorded = True
+            self._observe_upstream('ai', duration, '2xx')
+            self.rate_limiters['ai'].on_success()
+            
+            logger.info("AI API调用成功，任务内容: %.100s...", task_content)
+            return mock_result
+        finally:
+            # 未记录调用结果就退出时（等待令牌超时、协程被取消或发起调用前抛出异常）归还试探名额
+            if not recorded:
+                self._release_circuit('ai', probe)
+    
+    @staticmethod
+    def _mock_ai_result(task_content):
+        """构造模拟的AI API返回结果"""
+        return {
+            'title': f'AI分析结果: {task_content[:50]}...',
+            'description': f'基于任务内容"{task_content}"的详细分析描述',
+            'result': f'AI处理完成，任务内容: {task_content}。分析结果包括风险评估、建议措施等详细信息。'
+        }
@@ -12,6 +12,8 @@ import time
 BASE_URL = 'http://localhost:5000'
 TEST_EVENT_ID = 'test_event_123'
 TEST_APP_ID = 'test_app_456'
+# 准入控制测试最多发送的创建请求数，需将admission.max_app_queue_depth配置为小于该值才能触发429
+ADMISSION_TEST_MAX_REQUESTS = 50
 
 def test_health_check():
     """测试健康检查接口"""
@@ -114,6 +116,60 @@ def test_get_activities():
     
     print()
 
+def test_get_activities_paginated():
+    """测试AI任务列表分页、过滤和字段筛选"""
+    print("=== 测试AI任务列表分页、过滤和字段筛选 ===")
+    
+    url = f"{BASE_URL}/tickets/events/{TEST_EVENT_ID}/activities"
+    params = {
+        'limit': 1,
+        'app_id': TEST_APP_ID,
+        'fields': 'task_id,status'
+    }
+    
+    try:
+        # 再创建一个任务，保证至少有两条记录可以翻页
+        requests.post(url, json={'app_id': TEST_APP_ID, 'task_content': '分页测试任务'})
+        
+        response = requests.get(url, params=params)
+        print(f"第一页状态码: {response.status_code}")
+        print(f"第一页响应内容: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
+        
+        next_cursor = response.json().get('next_cursor')
+        if next_cursor:
+            params['cursor'] = next_cursor
+            response = requests.get(url, params=params)
+            print(f"第二页状态码: {response.status_code}")
+            print(f"第二页响应内容: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
+        else:
+            print("没有下一页")
+    except Exception as e:
+        print(f"请求失败: {str(e)}")
+    
+    print()
+
+def test_pagination_bad_request():
+    """测试分页参数不正确时返回400"""
+    print("=== 测试分页参数不正确时返回400 ===")
+    
+    cases = [
+        ('activities', {'cursor': 'invalid-cursor'}),
+        ('activities', {'fields': 'task_id,unknown_field'}),
+        ('artifacts', {'cursor': 'invalid-cursor'}),
+        ('artifacts', {'fields': 'unknown_field'})
+    ]
+    
+    for resource, params in cases:
+        url = f"{BASE_URL}/tickets/events/{TEST_EVENT_ID}/{resource}"
+        try:
+            response = requests.get(url, params=params)
+            print(f"{resource} {params} 状态码: {response.status_code}（预期400）")
+            print(f"响应内容: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
+        except Exception as e:
+            print(f"请求失败: {str(e)}")
+    
+    print()
+
 def test_get_artifacts():
     """测试获取AI任务结果接口"""
     print("=== 测试获取AI任务结果接口 ===")
@@ -129,6 +185,69 @@ def test_get_artifacts():
     
     print()
 
+def test_get_artifacts_paginated():
+    """测试AI任务结果分页和字段筛选"""
+    print("=== 测试AI任务结果分页和字段筛选 ===")
+    
+    url = f"{BASE_URL}/tickets/events/{TEST_EVENT_ID}/artifacts"
+    params = {
+        'limit': 1,
+        'fields': 'activity_id'
+    }
+    
+    try:
+        response = requests.get(url, params=params)
+        print(f"状态码: {response.status_code}")
+        print(f"响应内容: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
+    except Exception as e:
+        print(f"请求失败: {str(e)}")
+    
+    print()
+
+def test_admission_control():
+    """测试待执行任务超过准入上限时返回429和Retry-After"""
+    print("=== 测试创建AI任务准入控制 ===")
+    
+    url = f"{BASE_URL}/tickets/events/{TEST_EVENT_ID}/activities"
+    data = {
+        'app_id': f"{TEST_APP_ID}_admission",
+        'task_content': '准入控制测试任务'
+    }
+    
+    try:
+        for i in range(ADMISSION_TEST_MAX_REQUESTS):
+            response = requests.post(url, json=data)
+            if response.status_code == 429:
+                print(f"第 {i + 1} 次请求被拒绝，状态码: {response.status_code}")
+                print(f"Retry-After: {response.headers.get('Retry-After')}")
+                print(f"响应内容: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
+                break
+        else:
+            print(f"发送 {ADMISSION_TEST_MAX_REQUESTS} 次请求均未触发准入上限，最后一次状态码: {response.status_code}")
+    except Exception as e:
+        print(f"请求失败: {str(e)}")
+    
+    print()
+
+def test_metrics():
+    """测试Prometheus指标接口"""
+    print("=== 测试Prometheus指标接口 ===")
+    
+    url = f"{BASE_URL}/metrics"
+    
+    try:
+        response = requests.get(url)
+        print(f"状态码: {response.status_code}")
+        print(f"Content-Type: {response.headers.get('Content-Type')}")
+        lines = response.text.splitlines()
+        print(f"指标行数: {len(lines)}")
+        for name in ('wecode_ai_task_queue_depth', 'wecode_http_requests_total'):
+            print(f"包含 {name}: {any(line.startswith(name) for line in lines)}")
+    except Exception as e:
+        print(f"请求失败: {str(e)}")
+    
+    print()
+
 def main():
     """主测试函数"""
     print("开始API接口测试...")
@@ -146,7 +265,12 @@ def main():
     test_get_ticket_detail()
     test_create_ai_task()
     test_get_activities()
+    test_get_activities_paginated()
+    test_pagination_bad_request()
     test_get_artifacts()
+    test_get_artifacts_paginated()
+    test_admission_control()
+    test_metrics()
     
     print("API接口测试完成！")
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内TTL + LRU缓存模块
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# 缓存查询结果状态
+CACHE_MISS = 'miss'
+CACHE_FRESH = 'fresh'
+CACHE_STALE = 'stale'
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+class TTLCache:
+    """
+    线程安全的TTL + LRU缓存
+    
+    条目写入后ttl秒内为新鲜状态；过期后stale_ttl秒内仍可返回旧值（stale-while-revalidate），
+    由调用方在后台刷新；超过容量时淘汰最久未使用的条目。
+    """
+    
+    def __init__(self, name, max_entries=1000, ttl=30, stale_ttl=0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """
+        查询缓存
+        
+        Returns:
+            tuple: (状态, 值)，状态为CACHE_FRESH、CACHE_STALE或CACHE_MISS
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return CACHE_MISS, None
+            
+            value, expires_at = entry
+            if now < expires_at:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return CACHE_FRESH, value
+            
+            if now < expires_at + self.stale_ttl:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                return CACHE_STALE, value
+            
+            del self._data[key]
+            self.misses += 1
+            return CACHE_MISS, None
+    
+    def set(self, key, value):
+        """写入缓存，超过容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def begin_refresh(self, key):
+        """标记条目正在后台刷新，已在刷新中时返回False"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+    
+    def end_refresh(self, key):
+        """清除条目的后台刷新标记"""
+        with self._lock:
+            self._refreshing.discard(key)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """
+        获取缓存统计信息
+        
+        Returns:
+            dict: 条目数、命中数、过期命中数、未命中数和淘汰数
+        """
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def get_cache(name, max_entries=1000, ttl=30, stale_ttl=0):
+    """
+    获取进程内共享的命名缓存，首次调用时按参数创建
+    
+    Args:
+        name: 缓存名称
+        max_entries: 最大条目数
+        ttl: 新鲜期（秒）
+        stale_ttl: 过期后仍可返回旧值的时长（秒）
+    
+    Returns:
+        TTLCache: 缓存实例
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(name, max_entries=max_entries, ttl=ttl, stale_ttl=stale_ttl)
+        return _caches[name]
+
+def get_cache_stats():
+    """获取所有命名缓存的统计信息"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
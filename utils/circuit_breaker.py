@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游调用熔断器模块
+"""
+
+import threading
+import time
+from collections import deque
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被快速拒绝"""
+    
+    def __init__(self, name, retry_after):
+        super().__init__(f"上游服务 {name} 熔断中，{retry_after:.0f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    基于滑动窗口的熔断器
+    
+    closed状态下统计最近window_size次调用，调用数达到min_calls后，失败率或慢调用率超过阈值即打开；
+    open状态下调用直接抛出CircuitOpenError，open_seconds后进入half_open；
+    half_open状态下最多放行half_open_max_calls次试探调用，全部成功则关闭，任一失败则重新打开。
+    """
+    
+    def __init__(self, name, window_size=20, min_calls=10, failure_rate_threshold=0.5,
+                 slow_call_seconds=10, slow_call_rate_threshold=0.8, open_seconds=30, half_open_max_calls=3):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_successes = 0
+        self._window = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened_count = 0
+    
+    def _transition(self, state):
+        """切换状态，调用方需持有锁"""
+        self.state = state
+        if state == STATE_OPEN:
+            self.opened_at = time.monotonic()
+            self.opened_count += 1
+        if state in (STATE_OPEN, STATE_HALF_OPEN):
+            self.half_open_calls = 0
+            self.half_open_successes = 0
+        if state == STATE_CLOSED:
+            self._window.clear()
+    
+    def _retry_after(self, now):
+        """open状态剩余秒数，调用方需持有锁"""
+        return max(self.opened_at + self.open_seconds - now, 0)
+    
+    def allow_request(self):
+        """
+        检查是否允许发起调用
+        
+        Returns:
+            int: half_open状态下占用的试探名额标识，调用未发起时传给release归还；其他状态为None
+        
+        Raises:
+            CircuitOpenError: 熔断器打开，或half_open状态下试探调用已满
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == STATE_OPEN:
+                if self._retry_after(now) > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self._retry_after(now))
+                self._transition(STATE_HALF_OPEN)
+            
+            if self.state == STATE_HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 1)
+                self.half_open_calls += 1
+                return self.opened_count
+            return None
+    
+    def release(self, probe):
+        """
+        归还allow_request占用但未发起调用、也未记录结果的half_open试探名额
+        
+        Args:
+            probe: allow_request的返回值，熔断器已再次打开或关闭时不做处理
+        """
+        if probe is None:
+            return
+        with self._lock:
+            if self.state == STATE_HALF_OPEN and self.opened_count == probe and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+    
+    def record(self, success, duration):
+        """
+        记录一次调用结果
+        
+        Args:
+            success: 调用是否成功
+            duration: 调用耗时（秒）
+        """
+        slow = self.slow_call_seconds is not None and duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                if not success or slow:
+                    self._transition(STATE_OPEN)
+                else:
+                    self.half_open_successes += 1
+                    if self.half_open_successes >= self.half_open_max_calls:
+                        self._transition(STATE_CLOSED)
+                return
+            
+            if self.state != STATE_CLOSED:
+                return
+            
+            self._window.append((not success, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            
+            failure_rate = sum(1 for failed, _ in self._window if failed) / calls
+            slow_rate = sum(1 for _, is_slow in self._window if is_slow) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._transition(STATE_OPEN)
+    
+    def raise_if_open(self):
+        """
+        熔断器打开且尚未到试探时间时快速失败，不占用half_open试探名额
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == STATE_OPEN and self._retry_after(now) > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self._retry_after(now))
+    
+    def is_open(self):
+        """熔断器是否处于打开状态且尚未到试探时间"""
+        with self._lock:
+            return self.state == STATE_OPEN and self._retry_after(time.monotonic()) > 0
+    
+    def retry_after(self):
+        """距离允许试探调用的剩余秒数，未打开时为0"""
+        with self._lock:
+            if self.state != STATE_OPEN:
+                return 0
+            return self._retry_after(time.monotonic())
+    
+    def stats(self):
+        """
+        获取熔断器状态
+        
+        Returns:
+            dict: 当前状态、窗口内失败率/慢调用率、剩余打开时间和计数
+        """
+        with self._lock:
+            calls = len(self._window)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': round(sum(1 for failed, _ in self._window if failed) / calls, 3) if calls else 0,
+                'slow_call_rate': round(sum(1 for _, slow in self._window if slow) / calls, 3) if calls else 0,
+                'retry_after': round(self._retry_after(time.monotonic()), 3) if self.state == STATE_OPEN else 0,
+                'opened_count': self.opened_count,
+                'rejected': self.rejected
+            }
+
+def get_circuit_breaker(name, **kwargs):
+    """
+    获取进程内共享的命名熔断器，首次调用时按参数创建
+    
+    Args:
+        name: 端点类别名称
+        **kwargs: CircuitBreaker构造参数
+    
+    Returns:
+        CircuitBreaker: 熔断器实例
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+def get_circuit_breaker_stats():
+    """获取所有命名熔断器的状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
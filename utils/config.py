@@ -32,6 +32,7 @@ class Config:
         self.FLASK_HOST = flask_config.get('host', '0.0.0.0')
         self.FLASK_PORT = flask_config.get('port', 5000)
         self.FLASK_DEBUG = flask_config.get('debug', False)
+        self.FLASK_RUN_SCHEDULER = self._parse_bool(self._get_env_value('FLASK_RUN_SCHEDULER', flask_config.get('run_scheduler', True)))
         
         # 数据库配置
         db_config = config_data.get('database', {})
@@ -50,10 +51,117 @@ class Config:
         api_config = config_data.get('third_party_api', {})
         self.THIRD_PARTY_API_BASE_URL = self._get_env_value('THIRD_PARTY_API_BASE_URL', api_config.get('base_url', 'https://api.example.com'))
         self.THIRD_PARTY_API_KEY = self._get_env_value('THIRD_PARTY_API_KEY', api_config.get('api_key', 'your-api-key'))
+        self.THIRD_PARTY_API_POOL_SIZE = api_config.get('pool_size', 20)
+        self.THIRD_PARTY_API_CONNECT_TIMEOUT = api_config.get('connect_timeout', 3)
+        self.THIRD_PARTY_API_READ_TIMEOUT = api_config.get('read_timeout', 30)
+        self.THIRD_PARTY_API_RETRIES = api_config.get('retries', 3)
+        self.THIRD_PARTY_API_BACKOFF_FACTOR = api_config.get('backoff_factor', 0.5)
+        self.THIRD_PARTY_API_TOTAL_TIMEOUT = api_config.get('total_timeout', 70)
+        
+        # 出站请求限流配置
+        rate_limit_config = config_data.get('rate_limit', {})
+        self.RATE_LIMIT_ENABLED = rate_limit_config.get('enabled', True)
+        self.RATE_LIMIT_ACQUIRE_TIMEOUT = rate_limit_config.get('acquire_timeout', 10)
+        self.RATE_LIMIT_MIN_RATE = rate_limit_config.get('min_rate', 0.5)
+        self.RATE_LIMIT_INCREASE_STEP = rate_limit_config.get('increase_step', 0.5)
+        self.RATE_LIMIT_DECREASE_FACTOR = rate_limit_config.get('decrease_factor', 0.5)
+        self.RATE_LIMIT_TICKETS = rate_limit_config.get('tickets', {'rate': 10, 'burst': 20})
+        self.RATE_LIMIT_TICKET_DETAIL = rate_limit_config.get('ticket_detail', {'rate': 20, 'burst': 40})
+        self.RATE_LIMIT_AI = rate_limit_config.get('ai', {'rate': 5, 'burst': 10})
+        
+        # 上游调用熔断配置
+        breaker_config = config_data.get('circuit_breaker', {})
+        self.CIRCUIT_BREAKER_ENABLED = breaker_config.get('enabled', True)
+        self.CIRCUIT_BREAKER_WINDOW_SIZE = breaker_config.get('window_size', 20)
+        self.CIRCUIT_BREAKER_MIN_CALLS = breaker_config.get('min_calls', 10)
+        self.CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD = breaker_config.get('failure_rate_threshold', 0.5)
+        self.CIRCUIT_BREAKER_SLOW_CALL_SECONDS = breaker_config.get('slow_call_seconds', 10)
+        self.CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD = breaker_config.get('slow_call_rate_threshold', 0.8)
+        self.CIRCUIT_BREAKER_OPEN_SECONDS = breaker_config.get('open_seconds', 30)
+        self.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = breaker_config.get('half_open_max_calls', 3)
+        
+        # 第三方API响应缓存配置
+        cache_config = config_data.get('cache', {})
+        self.CACHE_ENABLED = cache_config.get('enabled', True)
+        self.CACHE_MAX_ENTRIES = cache_config.get('max_entries', 1000)
+        self.CACHE_TICKETS_TTL = cache_config.get('tickets_ttl', 30)
+        self.CACHE_TICKET_DETAIL_TTL = cache_config.get('ticket_detail_ttl', 60)
+        self.CACHE_STALE_TTL = cache_config.get('stale_ttl', 120)
+        
+        # AI任务准入控制配置
+        admission_config = config_data.get('admission', {})
+        self.ADMISSION_ENABLED = admission_config.get('enabled', True)
+        self.ADMISSION_MAX_QUEUE_DEPTH = admission_config.get('max_queue_depth', 10000)
+        self.ADMISSION_MAX_APP_QUEUE_DEPTH = admission_config.get('max_app_queue_depth', 2000)
+        self.ADMISSION_MAX_IN_FLIGHT = admission_config.get('max_in_flight', 0)
+        self.ADMISSION_MAX_APP_IN_FLIGHT = admission_config.get('max_app_in_flight', 0)
+        self.ADMISSION_DRAIN_WINDOW_SECONDS = admission_config.get('drain_window_seconds', 300)
+        self.ADMISSION_STATS_TTL = admission_config.get('stats_ttl', 2)
+        self.ADMISSION_MIN_RETRY_AFTER = admission_config.get('min_retry_after', 1)
+        self.ADMISSION_MAX_RETRY_AFTER = admission_config.get('max_retry_after', 600)
+        
+        # SQL执行统计配置
+        query_stats_config = config_data.get('query_stats', {})
+        self.QUERY_STATS_ENABLED = query_stats_config.get('enabled', True)
+        self.QUERY_STATS_SLOW_QUERY_MS = query_stats_config.get('slow_query_ms', 200)
+        self.QUERY_STATS_REPEAT_THRESHOLD = query_stats_config.get('repeat_threshold', 20)
+        self.QUERY_STATS_SERVER_TIMING = query_stats_config.get('server_timing', True)
+        
+        # 采样性能分析配置
+        profiler_config = config_data.get('profiler', {})
+        self.PROFILER_TOKEN = self._get_env_value('PROFILER_TOKEN', profiler_config.get('token', ''))
+        self.PROFILER_INTERVAL_MS = profiler_config.get('interval_ms', 10)
+        self.PROFILER_DEFAULT_SECONDS = profiler_config.get('default_seconds', 30)
+        self.PROFILER_MAX_SECONDS = profiler_config.get('max_seconds', 300)
+        self.PROFILER_SIGNAL = self._parse_bool(profiler_config.get('signal', True))
+        
+        # 链路追踪配置
+        tracing_config = config_data.get('tracing', {})
+        self.TRACING_ENABLED = self._parse_bool(self._get_env_value('TRACING_ENABLED', tracing_config.get('enabled', True)))
+        self.TRACING_EXPORTER = self._get_env_value('TRACING_EXPORTER', tracing_config.get('exporter', 'file'))
+        self.TRACING_FILE = tracing_config.get('file', 'traces.jsonl')
+        self.TRACING_OTLP_ENDPOINT = self._get_env_value('TRACING_OTLP_ENDPOINT', tracing_config.get('otlp_endpoint', 'http://localhost:4318/v1/traces'))
+        self.TRACING_SERVICE_NAME = tracing_config.get('service_name', 'wecode-sec-tools')
+        self.TRACING_SAMPLE_RATE = tracing_config.get('sample_rate', 1.0)
+        self.TRACING_QUEUE_SIZE = tracing_config.get('queue_size', 10000)
+        self.TRACING_BATCH_SIZE = tracing_config.get('batch_size', 200)
+        self.TRACING_FLUSH_INTERVAL = tracing_config.get('flush_interval', 5)
+        
+        # 列表接口分页配置
+        pagination_config = config_data.get('pagination', {})
+        self.PAGINATION_DEFAULT_LIMIT = pagination_config.get('default_limit', 50)
+        self.PAGINATION_MAX_LIMIT = pagination_config.get('max_limit', 200)
         
         # 定时任务配置
         scheduler_config = config_data.get('scheduler', {})
         self.SCHEDULER_INTERVAL = scheduler_config.get('interval', 10)
+        self.SCHEDULER_MAX_INTERVAL = scheduler_config.get('max_interval', 60)
+        self.SCHEDULER_WAKEUP_LISTEN = self._get_env_value('SCHEDULER_WAKEUP_LISTEN', scheduler_config.get('wakeup_listen', ''))
+        self.SCHEDULER_WAKEUP_TARGETS = self._parse_list(self._get_env_value('SCHEDULER_WAKEUP_TARGETS', scheduler_config.get('wakeup_targets', '')))
+        self.SCHEDULER_WORKERS = int(self._get_env_value('SCHEDULER_WORKERS', scheduler_config.get('workers', 4)))
+        self.SCHEDULER_LEASE_SECONDS = scheduler_config.get('lease_seconds', 300)
+        self.SCHEDULER_SKIP_LOCKED = scheduler_config.get('skip_locked', True)
+        self.SCHEDULER_BATCH_SIZE = scheduler_config.get('batch_size', 50)
+        self.SCHEDULER_MAX_TASKS_PER_TICK = scheduler_config.get('max_tasks_per_tick', 500)
+        self.SCHEDULER_MODE = self._get_env_value('SCHEDULER_MODE', scheduler_config.get('mode', 'thread'))
+        self.SCHEDULER_ASYNC_CONCURRENCY = scheduler_config.get('async_concurrency', 200)
+        self.SCHEDULER_MAX_ATTEMPTS = scheduler_config.get('max_attempts', 5)
+        self.SCHEDULER_RETRY_BASE_SECONDS = scheduler_config.get('retry_base_seconds', 10)
+        self.SCHEDULER_RETRY_MAX_SECONDS = scheduler_config.get('retry_max_seconds', 3600)
+        self.SCHEDULER_REAPER_INTERVAL = scheduler_config.get('reaper_interval', 60)
+        self.SCHEDULER_STALE_RUNNING_SECONDS = scheduler_config.get('stale_running_seconds', 600)
+        self.SCHEDULER_APP_DEFAULT_WEIGHT = scheduler_config.get('app_default_weight', 1)
+        self.SCHEDULER_APP_DEFAULT_MAX_RUNNING = scheduler_config.get('app_default_max_running', 0)
+        self.SCHEDULER_APP_POLICIES = scheduler_config.get('app_policies') or {}
+        self.SCHEDULER_PRIORITY_MIN = scheduler_config.get('priority_min', 0)
+        self.SCHEDULER_PRIORITY_MAX = scheduler_config.get('priority_max', 9)
+        
+        # 独立任务处理进程配置，覆盖scheduler中的并发设置
+        worker_config = config_data.get('worker', {})
+        self.WORKER_WORKERS = int(self._get_env_value('WORKER_WORKERS', worker_config.get('workers', self.SCHEDULER_WORKERS)))
+        self.WORKER_MODE = self._get_env_value('WORKER_MODE', worker_config.get('mode', self.SCHEDULER_MODE))
+        self.WORKER_ASYNC_CONCURRENCY = worker_config.get('async_concurrency', self.SCHEDULER_ASYNC_CONCURRENCY)
+        self.WORKER_WAKEUP_LISTEN = self._get_env_value('WORKER_WAKEUP_LISTEN', worker_config.get('wakeup_listen', self.SCHEDULER_WAKEUP_LISTEN))
         
         # 日志配置
         logging_config = config_data.get('logging', {})
@@ -62,6 +170,12 @@ class Config:
         self.LOG_FILE = self._get_env_value('LOG_FILE', logging_config.get('file', 'wecode_sec_tools.log'))
         self.LOG_MAX_BYTES = self._get_env_value('LOG_MAX_BYTES', logging_config.get('max_bytes', 10*1024*1024))  # 10MB
         self.LOG_BACKUP_COUNT = self._get_env_value('LOG_BACKUP_COUNT', logging_config.get('backup_count', 5))
+        self.LOG_ASYNC = self._parse_bool(self._get_env_value('LOG_ASYNC', logging_config.get('async', True)))
+        self.LOG_FORMAT = self._get_env_value('LOG_FORMAT', logging_config.get('format', 'text'))
+        self.LOG_COMPRESS = logging_config.get('compress', True)
+        self.LOG_QUEUE_SIZE = logging_config.get('queue_size', 10000)
+        self.LOG_REPEAT_BURST = logging_config.get('repeat_burst', 10)
+        self.LOG_REPEAT_WINDOW = logging_config.get('repeat_window', 60)
     
     def _set_defaults(self):
         """设置默认配置"""
@@ -69,6 +183,7 @@ class Config:
         self.FLASK_HOST = '0.0.0.0'
         self.FLASK_PORT = 5000
         self.FLASK_DEBUG = False
+        self.FLASK_RUN_SCHEDULER = self._parse_bool(os.environ.get('FLASK_RUN_SCHEDULER', True))
         
         self.MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
         self.MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
@@ -81,8 +196,97 @@ class Config:
         
         self.THIRD_PARTY_API_BASE_URL = os.environ.get('THIRD_PARTY_API_BASE_URL', 'https://api.example.com')
         self.THIRD_PARTY_API_KEY = os.environ.get('THIRD_PARTY_API_KEY', 'your-api-key')
+        self.THIRD_PARTY_API_POOL_SIZE = 20
+        self.THIRD_PARTY_API_CONNECT_TIMEOUT = 3
+        self.THIRD_PARTY_API_READ_TIMEOUT = 30
+        self.THIRD_PARTY_API_RETRIES = 3
+        self.THIRD_PARTY_API_BACKOFF_FACTOR = 0.5
+        self.THIRD_PARTY_API_TOTAL_TIMEOUT = 70
+        
+        self.RATE_LIMIT_ENABLED = True
+        self.RATE_LIMIT_ACQUIRE_TIMEOUT = 10
+        self.RATE_LIMIT_MIN_RATE = 0.5
+        self.RATE_LIMIT_INCREASE_STEP = 0.5
+        self.RATE_LIMIT_DECREASE_FACTOR = 0.5
+        self.RATE_LIMIT_TICKETS = {'rate': 10, 'burst': 20}
+        self.RATE_LIMIT_TICKET_DETAIL = {'rate': 20, 'burst': 40}
+        self.RATE_LIMIT_AI = {'rate': 5, 'burst': 10}
+        
+        self.CIRCUIT_BREAKER_ENABLED = True
+        self.CIRCUIT_BREAKER_WINDOW_SIZE = 20
+        self.CIRCUIT_BREAKER_MIN_CALLS = 10
+        self.CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD = 0.5
+        self.CIRCUIT_BREAKER_SLOW_CALL_SECONDS = 10
+        self.CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD = 0.8
+        self.CIRCUIT_BREAKER_OPEN_SECONDS = 30
+        self.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = 3
+        
+        self.CACHE_ENABLED = True
+        self.CACHE_MAX_ENTRIES = 1000
+        self.CACHE_TICKETS_TTL = 30
+        self.CACHE_TICKET_DETAIL_TTL = 60
+        self.CACHE_STALE_TTL = 120
+        
+        self.ADMISSION_ENABLED = True
+        self.ADMISSION_MAX_QUEUE_DEPTH = 10000
+        self.ADMISSION_MAX_APP_QUEUE_DEPTH = 2000
+        self.ADMISSION_MAX_IN_FLIGHT = 0
+        self.ADMISSION_MAX_APP_IN_FLIGHT = 0
+        self.ADMISSION_DRAIN_WINDOW_SECONDS = 300
+        self.ADMISSION_STATS_TTL = 2
+        self.ADMISSION_MIN_RETRY_AFTER = 1
+        self.ADMISSION_MAX_RETRY_AFTER = 600
+        
+        self.QUERY_STATS_ENABLED = True
+        self.QUERY_STATS_SLOW_QUERY_MS = 200
+        self.QUERY_STATS_REPEAT_THRESHOLD = 20
+        self.QUERY_STATS_SERVER_TIMING = True
+        
+        self.PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+        self.PROFILER_INTERVAL_MS = 10
+        self.PROFILER_DEFAULT_SECONDS = 30
+        self.PROFILER_MAX_SECONDS = 300
+        self.PROFILER_SIGNAL = True
+        
+        self.TRACING_ENABLED = self._parse_bool(os.environ.get('TRACING_ENABLED', True))
+        self.TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'file')
+        self.TRACING_FILE = 'traces.jsonl'
+        self.TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+        self.TRACING_SERVICE_NAME = 'wecode-sec-tools'
+        self.TRACING_SAMPLE_RATE = 1.0
+        self.TRACING_QUEUE_SIZE = 10000
+        self.TRACING_BATCH_SIZE = 200
+        self.TRACING_FLUSH_INTERVAL = 5
+        
+        self.PAGINATION_DEFAULT_LIMIT = 50
+        self.PAGINATION_MAX_LIMIT = 200
         
         self.SCHEDULER_INTERVAL = 10
+        self.SCHEDULER_MAX_INTERVAL = 60
+        self.SCHEDULER_WAKEUP_LISTEN = os.environ.get('SCHEDULER_WAKEUP_LISTEN', '')
+        self.SCHEDULER_WAKEUP_TARGETS = self._parse_list(os.environ.get('SCHEDULER_WAKEUP_TARGETS', ''))
+        self.SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', 4))
+        self.SCHEDULER_LEASE_SECONDS = 300
+        self.SCHEDULER_SKIP_LOCKED = True
+        self.SCHEDULER_BATCH_SIZE = 50
+        self.SCHEDULER_MAX_TASKS_PER_TICK = 500
+        self.SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'thread')
+        self.SCHEDULER_ASYNC_CONCURRENCY = 200
+        self.SCHEDULER_MAX_ATTEMPTS = 5
+        self.SCHEDULER_RETRY_BASE_SECONDS = 10
+        self.SCHEDULER_RETRY_MAX_SECONDS = 3600
+        self.SCHEDULER_REAPER_INTERVAL = 60
+        self.SCHEDULER_STALE_RUNNING_SECONDS = 600
+        self.SCHEDULER_APP_DEFAULT_WEIGHT = 1
+        self.SCHEDULER_APP_DEFAULT_MAX_RUNNING = 0
+        self.SCHEDULER_APP_POLICIES = {}
+        self.SCHEDULER_PRIORITY_MIN = 0
+        self.SCHEDULER_PRIORITY_MAX = 9
+        
+        self.WORKER_WORKERS = int(os.environ.get('WORKER_WORKERS', self.SCHEDULER_WORKERS))
+        self.WORKER_MODE = os.environ.get('WORKER_MODE', self.SCHEDULER_MODE)
+        self.WORKER_ASYNC_CONCURRENCY = self.SCHEDULER_ASYNC_CONCURRENCY
+        self.WORKER_WAKEUP_LISTEN = os.environ.get('WORKER_WAKEUP_LISTEN', self.SCHEDULER_WAKEUP_LISTEN)
         
         # 日志默认配置
         self.LOG_LEVEL = 'INFO'
@@ -90,6 +294,26 @@ class Config:
         self.LOG_FILE = 'wecode_sec_tools.log'
         self.LOG_MAX_BYTES = 10*1024*1024  # 10MB
         self.LOG_BACKUP_COUNT = 5
+        self.LOG_ASYNC = True
+        self.LOG_FORMAT = 'text'
+        self.LOG_COMPRESS = True
+        self.LOG_QUEUE_SIZE = 10000
+        self.LOG_REPEAT_BURST = 10
+        self.LOG_REPEAT_WINDOW = 60
+    
+    def _parse_bool(self, value):
+        """解析布尔值，支持环境变量中的true/false、1/0、yes/no"""
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', '1', 'yes', 'on')
+        return bool(value)
+    
+    def _parse_list(self, value):
+        """解析逗号分隔的字符串或YAML列表"""
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = value.split(',')
+        return [item.strip() for item in value if item and item.strip()]
     
     def _get_env_value(self, env_key, default_value):
         """获取环境变量值，支持${ENV_VAR:-default}格式"""
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP连接池管理模块
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+class HTTPClient:
+    """
+    进程内共享的HTTP客户端，持有长连接池，对幂等的GET请求按退避策略重试
+    
+    适配器只重试连接失败和502/504，429/503交给调用方的限流器和熔断器处理，不在适配器内按Retry-After等待；
+    重试次数按total_timeout收紧，保证一次调用（含重试和退避）的最长耗时不超过该预算。
+    """
+    
+    def __init__(self, pool_size=20, connect_timeout=3, read_timeout=30, retries=3, backoff_factor=0.5, total_timeout=70):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = self._bounded_retries(retries, connect_timeout + read_timeout, backoff_factor, total_timeout)
+        if self.retries < retries:
+            logger.info(
+                "GET重试次数由 %d 收紧为 %d，单次调用最长耗时不超过 %s 秒", retries, self.retries, total_timeout
+            )
+        
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+        
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+    
+    @staticmethod
+    def _bounded_retries(retries, attempt_seconds, backoff_factor, total_timeout):
+        """
+        计算不超过总耗时预算的重试次数
+        
+        Args:
+            retries: 配置的重试次数
+            attempt_seconds: 单次尝试的最长耗时（连接超时 + 读取超时）
+            backoff_factor: 重试退避系数，第n次重试前等待 backoff_factor * 2^(n-1) 秒
+            total_timeout: 一次调用的总耗时预算（秒）
+        
+        Returns:
+            int: 重试次数
+        """
+        while retries > 0 and (retries + 1) * attempt_seconds + backoff_factor * (2 ** retries - 1) > total_timeout:
+            retries -= 1
+        return retries
+    
+    def get(self, url, **kwargs):
+        """发送GET请求，未指定timeout时使用连接/读取超时配置"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        """发送POST请求，未指定timeout时使用连接/读取超时配置"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(url, **kwargs)
+    
+    def get_pool_stats(self):
+        """
+        获取连接池统计信息
+        
+        Returns:
+            dict: 各主机连接池的请求数、新建连接数（未命中）和连接复用数（命中）
+        """
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'requests': pool.num_requests,
+                'misses': pool.num_connections,
+                'hits': max(pool.num_requests - pool.num_connections, 0)
+            }
+        
+        return {
+            'requests': sum(host['requests'] for host in hosts.values()),
+            'hits': sum(host['hits'] for host in hosts.values()),
+            'misses': sum(host['misses'] for host in hosts.values()),
+            'hosts': hosts
+        }
+
+def get_http_client(config):
+    """
+    获取进程内共享的HTTP客户端，首次调用时按配置创建
+    
+    Args:
+        config: Flask应用配置
+    
+    Returns:
+        HTTPClient: HTTP客户端实例
+    """
+    global _http_client
+    
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HTTPClient(
+                    pool_size=config['THIRD_PARTY_API_POOL_SIZE'],
+                    connect_timeout=config['THIRD_PARTY_API_CONNECT_TIMEOUT'],
+                    read_timeout=config['THIRD_PARTY_API_READ_TIMEOUT'],
+                    retries=config['THIRD_PARTY_API_RETRIES'],
+                    backoff_factor=config['THIRD_PARTY_API_BACKOFF_FACTOR'],
+                    total_timeout=config['THIRD_PARTY_API_TOTAL_TIMEOUT']
+                )
+    
+    return _http_client
+
+def get_http_pool_stats():
+    """
+    获取共享HTTP客户端的连接池统计信息，客户端尚未创建时返回None
+    """
+    if _http_client is None:
+        return None
+    return _http_client.get_pool_stats()
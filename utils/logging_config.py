@@ -4,12 +4,153 @@
 日志配置文件
 """
 
+import atexit
+import gzip
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 
-def setup_logging(log_level='INFO', log_file=None, max_bytes=10*1024*1024, backup_count=5):
+_listener = None
+_listener_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，便于日志平台解析"""
+    
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class RepeatedLogFilter(logging.Filter):
+    """
+    限制相同日志的输出频率
+    
+    WARNING及以上级别的日志按（日志记录器, 级别, 消息模板）计数，每个窗口内最多输出burst条，
+    其余丢弃并在窗口结束后的下一条中注明丢弃数量，避免上游故障期间每个任务的失败日志刷屏。
+    消息模板为%格式化前的原始消息，只有参数不同的日志视为相同。
+    """
+    
+    def __init__(self, burst=10, window=60):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        
+        # 同步模式下多个处理器共用一个过滤器，同一条日志只判断一次
+        allowed = getattr(record, 'repeat_allowed', None)
+        if allowed is not None:
+            return allowed
+        record.repeat_allowed = self._allow(record)
+        return record.repeat_allowed
+    
+    def _allow(self, record):
+        """判断是否输出，窗口结束后的第一条日志注明上个窗口丢弃的数量"""
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window:
+                suppressed = counter[2] if counter else 0
+                self._counters[key] = [now, 1, 0]
+                if len(self._counters) > 10000:
+                    self._counters = {key: self._counters[key]}
+            elif counter[1] < self.burst:
+                counter[1] += 1
+                suppressed = 0
+            else:
+                counter[2] += 1
+                return False
+        
+        if suppressed:
+            record.msg = f"{record.msg}（过去{self.window}秒内另有 {suppressed} 条相同日志已丢弃）"
+        return True
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把日志放入队列的处理器，格式化和写文件由后台线程完成
+    
+    放入队列前只合并消息参数和异常堆栈，不做完整格式化；队列满时丢弃日志并计数，不阻塞业务线程。
+    """
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # 参数可能在之后被修改，入队前先合并为消息文本
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def gzip_namer(name):
+    """轮转后的日志文件名增加.gz后缀"""
+    return name + '.gz'
+
+def gzip_rotator(source, dest):
+    """轮转时压缩旧文件，在写文件的后台线程中执行"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def process_file_name(file_name, role=None):
+    """
+    按进程角色区分日志类文件名，避免多个进程轮转同一个文件
+    
+    Args:
+        file_name: 配置的文件名，如 wecode_sec_tools.log
+        role: 进程角色，如 worker；为空时返回原文件名
+    
+    Returns:
+        str: 文件名，如 wecode_sec_tools.worker.log
+    """
+    if not role:
+        return file_name
+    stem, dot, suffix = file_name.rpartition('.')
+    return f"{stem}.{role}.{suffix}" if dot else f"{file_name}.{role}"
+
+def stop_logging():
+    """停止后台写日志线程，写完队列中剩余的日志"""
+    global _listener
+    
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def setup_logging(log_level='INFO', log_file=None, max_bytes=10*1024*1024, backup_count=5,
+                  async_mode=False, json_format=False, compress=False, queue_size=10000,
+                  repeat_burst=0, repeat_window=60):
     """
     设置日志配置
     
@@ -18,12 +159,22 @@ def setup_logging(log_level='INFO', log_file=None, max_bytes=10*1024*1024, backu
         log_file: 日志文件路径，如果为None则只输出到控制台
         max_bytes: 单个日志文件最大大小，默认10MB
         backup_count: 保留的日志文件数量，默认5个
+        async_mode: 是否由后台线程格式化和写日志，业务线程只把日志放入队列
+        json_format: 日志文件是否每行输出一条JSON
+        compress: 轮转后的日志文件是否gzip压缩
+        queue_size: 异步模式下日志队列的长度上限，队列满时丢弃日志
+        repeat_burst: 相同的WARNING及以上级别日志每个窗口内最多输出的条数，0表示不限制
+        repeat_window: 相同日志限流的窗口时长（秒）
     """
+    global _listener
+    
     # 创建logs目录
     if log_file:
         log_dir = Path(log_file).parent
         log_dir.mkdir(parents=True, exist_ok=True)
     
+    level = getattr(logging, log_level.upper())
+    
     # 设置日志格式
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -32,17 +183,18 @@ def setup_logging(log_level='INFO', log_file=None, max_bytes=10*1024*1024, backu
     
     # 获取根日志记录器
     root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level.upper()))
+    root_logger.setLevel(level)
     
-    # 清除现有的处理器
+    # 清除现有的处理器，重复调用时先写完上一次配置的队列中的日志
+    stop_logging()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
     # 控制台处理器
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(getattr(logging, log_level.upper()))
+    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # 文件处理器（如果指定了日志文件）
     if log_file:
@@ -52,9 +204,25 @@ def setup_logging(log_level='INFO', log_file=None, max_bytes=10*1024*1024, backu
             backupCount=backup_count,
             encoding='utf-8'
         )
-        file_handler.setLevel(getattr(logging, log_level.upper()))
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        file_handler.setLevel(level)
+        file_handler.setFormatter(JsonFormatter() if json_format else formatter)
+        if compress:
+            file_handler.namer = gzip_namer
+            file_handler.rotator = gzip_rotator
+        handlers.append(file_handler)
+    
+    if async_mode:
+        queue_handler = AsyncQueueHandler(queue.Queue(maxsize=queue_size))
+        with _listener_lock:
+            _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            _listener.start()
+        handlers = [queue_handler]
+    
+    repeat_filter = RepeatedLogFilter(repeat_burst, repeat_window) if repeat_burst else None
+    for handler in handlers:
+        if repeat_filter:
+            handler.addFilter(repeat_filter)
+        root_logger.addHandler(handler)
     
     # 设置第三方库的日志级别
     logging.getLogger('urllib3').setLevel(logging.WARNING)
@@ -75,13 +243,15 @@ def get_logger(name):
     """
     return logging.getLogger(name)
 
-def setup_app_logging(app_name='WeCodeSecTools', log_dir='logs'):
+def setup_app_logging(app_name='WeCodeSecTools', log_dir='logs', config=None, role=None):
     """
     为应用设置日志配置
     
     Args:
         app_name: 应用名称
         log_dir: 日志目录
+        config: 应用配置，提供时按其中的LOG_*配置设置日志级别、文件和异步写入等
+        role: 进程角色，提供时日志文件名带上角色后缀，Web进程为空
         
     Returns:
         logging.Logger: 应用日志记录器
@@ -90,19 +260,34 @@ def setup_app_logging(app_name='WeCodeSecTools', log_dir='logs'):
     log_path = Path(log_dir)
     log_path.mkdir(exist_ok=True)
     
-    # 设置日志文件路径
-    log_file = log_path / f"{app_name.lower()}.log"
-    
-    # 设置日志配置
-    setup_logging(
-        log_level='INFO',
-        log_file=str(log_file),
-        max_bytes=10*1024*1024,  # 10MB
-        backup_count=5
-    )
+    if config is None:
+        log_file = log_path / process_file_name(f"{app_name.lower()}.log", role)
+        setup_logging(
+            log_level='INFO',
+            log_file=str(log_file),
+            max_bytes=10*1024*1024,  # 10MB
+            backup_count=5
+        )
+    else:
+        log_file = log_path / process_file_name(config.LOG_FILE, role)
+        setup_logging(
+            log_level=config.LOG_LEVEL,
+            log_file=str(log_file),
+            max_bytes=int(config.LOG_MAX_BYTES),
+            backup_count=int(config.LOG_BACKUP_COUNT),
+            async_mode=config.LOG_ASYNC,
+            json_format=config.LOG_FORMAT == 'json',
+            compress=config.LOG_COMPRESS,
+            queue_size=config.LOG_QUEUE_SIZE,
+            repeat_burst=config.LOG_REPEAT_BURST,
+            repeat_window=config.LOG_REPEAT_WINDOW
+        )
     
     # 获取应用日志记录器
     app_logger = get_logger(app_name)
     app_logger.info(f"应用日志系统初始化完成，日志文件：{log_file}")
     
     return app_logger
+
+# 进程退出前写完队列中剩余的日志
+atexit.register(stop_logging)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内运行指标模块，以Prometheus文本格式输出
+"""
+
+import bisect
+import threading
+
+# 耗时类指标的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def _escape(value):
+    """转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    """拼接标签，如 {route="/health",status="200"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _bucket_label(bound):
+    """分桶上界标签"""
+    return 'le="%s"' % bound
+
+def _format_value(value):
+    """格式化样本值，整数不带小数点"""
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+class _ShardedMetric:
+    """
+    按线程分片记录的指标基类
+    
+    每个线程写入自己的分片，记录时不加锁；输出时汇总所有分片。
+    新线程创建分片和输出时，已退出线程的分片合并到基础分片后释放，分片数不超过存活的线程数。
+    """
+    
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._base = {}
+        self._lock = threading.Lock()
+    
+    def _shard(self):
+        """获取当前线程的分片，首次记录时创建"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._reap_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+    
+    def _reap_dead_shards(self):
+        """把已退出线程的分片合并到基础分片并释放，调用方需持有self._lock"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._base, shard)
+        self._shards = alive
+    
+    def _merge(self, target, source):
+        raise NotImplementedError
+    
+    def _snapshot(self):
+        """汇总所有分片，并回收已退出线程的分片"""
+        with self._lock:
+            self._reap_dead_shards()
+            
+            total = {}
+            self._merge(total, self._base)
+            for _, shard in self._shards:
+                self._merge(total, dict(shard))
+            return total
+
+class Counter(_ShardedMetric):
+    """只增不减的计数指标"""
+    
+    type = 'counter'
+    
+    def inc(self, *labelvalues, amount=1):
+        """
+        增加计数
+        
+        Args:
+            *labelvalues: 按labelnames顺序的标签值
+            amount: 增加量
+        """
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+    
+    def _merge(self, target, source):
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+    
+    def render(self):
+        """输出为文本格式的样本行"""
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self._snapshot().items())
+        ]
+
+class Histogram(_ShardedMetric):
+    """分桶统计的分布指标"""
+    
+    type = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, *labelvalues):
+        """
+        记录一个观测值
+        
+        Args:
+            value: 观测值，耗时类指标单位为秒
+            *labelvalues: 按labelnames顺序的标签值
+        """
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # [各分桶计数..., 超出最大分桶的计数, 总和]
+            state = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[labelvalues] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+    
+    def _merge(self, target, source):
+        for key, state in source.items():
+            merged = target.get(key)
+            if merged is None:
+                target[key] = list(state)
+            else:
+                for index, value in enumerate(state):
+                    merged[index] += value
+    
+    def render(self):
+        """输出为文本格式的样本行，分桶计数为累计值"""
+        lines = []
+        for key, state in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, _bucket_label(bound))} {cumulative}')
+            cumulative += state[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, _bucket_label("+Inf"))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+class Gauge:
+    """
+    可增可减的瞬时值指标，用于输出前按需采集的数据（如队列深度），不在请求路径上更新
+    """
+    
+    type = 'gauge'
+    
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def set(self, value, *labelvalues):
+        """设置指标值"""
+        with self._lock:
+            self._values[labelvalues] = value
+    
+    def replace(self, values):
+        """
+        整体替换所有标签组合的值，未出现的标签组合不再输出
+        
+        Args:
+            values: {标签值元组: 指标值}
+        """
+        with self._lock:
+            self._values = dict(values)
+    
+    def render(self):
+        """输出为文本格式的样本行"""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+def _register(cls, name, documentation, labelnames, **kwargs):
+    """获取已注册的同名指标，不存在时创建"""
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            _metrics[name] = metric
+        return metric
+
+def counter(name, documentation, labelnames=()):
+    """获取进程内共享的计数指标，首次调用时创建"""
+    return _register(Counter, name, documentation, labelnames)
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """获取进程内共享的分布指标，首次调用时创建"""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+def gauge(name, documentation, labelnames=()):
+    """获取进程内共享的瞬时值指标，首次调用时创建"""
+    return _register(Gauge, name, documentation, labelnames)
+
+def render_metrics():
+    """
+    以Prometheus文本格式输出所有已注册的指标
+    
+    Returns:
+        str: 文本格式的指标数据
+    """
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
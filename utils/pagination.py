@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+键集分页游标模块
+"""
+
+import base64
+import json
+from datetime import datetime
+
+def encode_cursor(created_at, record_id):
+    """
+    将(created_at, id)编码为不透明的分页游标
+    
+    Args:
+        created_at: 当前页最后一条记录的创建时间
+        record_id: 当前页最后一条记录的主键
+    
+    Returns:
+        str: URL安全的游标字符串
+    """
+    payload = json.dumps({'c': created_at.isoformat(), 'i': record_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    解析分页游标
+    
+    Args:
+        cursor: encode_cursor生成的游标字符串
+    
+    Returns:
+        tuple: (created_at, id)
+    
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return datetime.fromisoformat(payload['c']), int(payload['i'])
+    except (TypeError, KeyError, UnicodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+def parse_limit(value, default_limit, max_limit):
+    """
+    规范化每页条数，缺省时使用default_limit，超出范围时截断到[1, max_limit]
+    """
+    if value is None:
+        return default_limit
+    return max(1, min(value, max_limit))
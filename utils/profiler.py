@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按需开启的采样性能分析模块
+
+开启后由后台线程按固定间隔通过 sys._current_frames() 采集各线程的调用栈，
+结束时以折叠栈格式（flamegraph.pl、speedscope等工具可直接读取）写入日志目录。
+未开启时不启动采样线程，不影响请求处理。
+"""
+
+import hmac
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+class ProfileSession:
+    """一次性能分析的采样结果"""
+    
+    def __init__(self, label, thread_ids=None, deadline=None):
+        """
+        Args:
+            label: 输出文件名中的标识，如请求路由或signal
+            thread_ids: 只采样这些线程，为None时采样除采样线程外的所有线程
+            deadline: 到期自动结束的时间（time.monotonic()），为None时由调用方结束
+        """
+        self.label = label
+        self.thread_ids = thread_ids
+        self.deadline = deadline
+        self.started_at = datetime.now()
+        self.samples = 0
+        self.stacks = Counter()
+        self.path = None
+
+class SamplingProfiler:
+    """
+    采样性能分析器
+    
+    多个分析会话共用一个采样线程：有会话时按interval采样，所有会话结束后采样线程退出。
+    """
+    
+    def __init__(self, output_dir, token='', interval=0.01, default_seconds=30, max_seconds=300):
+        self.output_dir = Path(output_dir)
+        self.token = token
+        self.interval = interval
+        self.default_seconds = default_seconds
+        self.max_seconds = max_seconds
+        self.sessions = []
+        self._thread = None
+        # 信号处理函数在主线程中调用，主线程可能正持有锁，使用可重入锁避免死锁
+        self._lock = threading.RLock()
+        self.completed = 0
+    
+    @property
+    def enabled(self):
+        """配置了令牌时才允许通过请求头和管理接口开启"""
+        return bool(self.token)
+    
+    def check_token(self, token):
+        """校验请求携带的令牌"""
+        # compare_digest只接受ASCII字符串，按字节比较以免请求头含非ASCII字符时抛出TypeError
+        return self.enabled and bool(token) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+    
+    def start(self, label, thread_ids=None, seconds=None):
+        """
+        开始一个分析会话
+        
+        Args:
+            label: 输出文件名中的标识
+            thread_ids: 只采样这些线程，为None时采样所有线程
+            seconds: 采样时长，到期后自动写入结果，为None时需调用stop结束
+        
+        Returns:
+            ProfileSession: 分析会话
+        """
+        deadline = None
+        if seconds is not None:
+            deadline = time.monotonic() + min(seconds, self.max_seconds)
+        session = ProfileSession(label, thread_ids, deadline)
+        
+        with self._lock:
+            self.sessions.append(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        return session
+    
+    def stop(self, session):
+        """
+        结束分析会话并写入结果
+        
+        Returns:
+            Path: 结果文件路径，会话已结束时返回已写入的路径
+        """
+        with self._lock:
+            if session not in self.sessions:
+                return session.path
+            self.sessions.remove(session)
+        return self._write(session)
+    
+    def _run(self):
+        """采样线程：采集所有会话关注的线程调用栈，直到没有会话"""
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                expired = [session for session in self.sessions if session.deadline and now >= session.deadline]
+                for session in expired:
+                    self.sessions.remove(session)
+                sessions = list(self.sessions)
+                if not sessions and not expired:
+                    self._thread = None
+                    return
+            
+            for session in expired:
+                self._write(session)
+            
+            if sessions:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames = sys._current_frames()
+                folded = {}
+                for session in sessions:
+                    session.samples += 1
+                    for thread_id, frame in frames.items():
+                        if thread_id == own_id or (session.thread_ids is not None and thread_id not in session.thread_ids):
+                            continue
+                        if thread_id not in folded:
+                            folded[thread_id] = _fold(frame, names.get(thread_id, str(thread_id)))
+                        session.stacks[folded[thread_id]] += 1
+                del frames
+            
+            time.sleep(self.interval)
+    
+    def _write(self, session):
+        """以折叠栈格式写入结果文件，每行为 栈帧;栈帧;... 采样次数"""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            label = re.sub(r'[^A-Za-z0-9_.-]+', '_', session.label).strip('_') or 'profile'
+            path = self.output_dir / f"{session.started_at:%Y%m%d-%H%M%S-%f}-{os.getpid()}-{label}.folded"
+            with open(path, 'w', encoding='utf-8') as file:
+                for stack, count in session.stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+            session.path = path
+            self.completed += 1
+            logger.info(f"性能分析结果已写入 {path}，共采样 {session.samples} 次")
+            return path
+        except Exception as e:
+            logger.error(f"写入性能分析结果失败: {str(e)}")
+            return None
+    
+    def stats(self):
+        """
+        获取性能分析器统计信息
+        
+        Returns:
+            dict: 是否允许开启、进行中和已完成的会话数
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'active_sessions': len(self.sessions),
+                'completed_sessions': self.completed
+            }
+
+def _fold(frame, thread_name):
+    """把调用栈转换为折叠栈格式，根节点为线程名"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    # 折叠栈格式以分号分隔栈帧，以最后一个空格分隔采样次数
+    return ';'.join(name.replace(';', ':') for name in reversed(names))
+
+def install_signal_handler(profiler):
+    """
+    收到SIGUSR2时采样所有线程default_seconds秒，只能在主线程中调用
+    
+    Returns:
+        bool: 当前平台是否支持SIGUSR2
+    """
+    if not hasattr(signal, 'SIGUSR2'):
+        return False
+    
+    def handle_signal(signum, frame):
+        profiler.start('signal', seconds=profiler.default_seconds)
+    
+    signal.signal(signal.SIGUSR2, handle_signal)
+    return True
+
+def get_profiler(config):
+    """
+    获取进程内共享的性能分析器，首次调用时按配置创建
+    
+    Args:
+        config: Flask应用配置
+    
+    Returns:
+        SamplingProfiler: 性能分析器实例
+    """
+    global _profiler
+    
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler(
+                    output_dir=Path(config['LOG_DIR']) / 'profiles',
+                    token=config['PROFILER_TOKEN'],
+                    interval=config['PROFILER_INTERVAL_MS'] / 1000,
+                    default_seconds=config['PROFILER_DEFAULT_SECONDS'],
+                    max_seconds=config['PROFILER_MAX_SECONDS']
+                )
+    
+    return _profiler
+
+def get_profiler_stats():
+    """
+    获取共享性能分析器的统计信息，尚未创建时返回None
+    """
+    if _profiler is None:
+        return None
+    return _profiler.stats()
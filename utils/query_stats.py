@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQL执行统计模块
+
+基于SQLAlchemy引擎事件统计每个HTTP请求和每次调度执行的SQL条数与数据库耗时，
+记录慢SQL，并识别同一作用域内反复执行的相同SQL（N+1查询）。
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.logging_config import get_logger
+from utils.metrics import counter, histogram
+
+logger = get_logger(__name__)
+
+# 每个作用域内SQL条数的分桶
+STATEMENT_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+statement_duration = histogram('wecode_db_statement_duration_seconds', '单条SQL执行耗时', ['operation'])
+slow_statements = counter('wecode_db_slow_statements_total', '超过慢SQL阈值的SQL条数', ['operation'])
+repeated_statements = counter('wecode_db_repeated_statements_total', '同一作用域内疑似N+1的重复SQL次数', ['kind', 'name'])
+scope_statements = histogram('wecode_db_scope_statements', '每个请求或调度执行的SQL条数', ['kind', 'name'],
+                             buckets=STATEMENT_COUNT_BUCKETS)
+scope_duration = histogram('wecode_db_scope_duration_seconds', '每个请求或调度的数据库总耗时', ['kind', 'name'])
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\?|:\w+')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_local = threading.local()
+_settings = {
+    'enabled': False,
+    'slow_query_seconds': 0.2,
+    'repeat_threshold': 20,
+    'server_timing': True
+}
+_install_lock = threading.Lock()
+_installed = False
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement):
+    """
+    归一化SQL：字面量和绑定参数替换为?，IN列表合并为 IN (?)，空白合并为单个空格
+    
+    同一查询只是参数不同时归一化结果相同，可用于识别重复执行的SQL。
+    """
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (?)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+def _operation(statement):
+    """SQL的操作类型，如SELECT、UPDATE"""
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else 'OTHER'
+
+def _redact(parameters, executemany):
+    """参数只保留类型，不输出取值"""
+    if executemany:
+        return f"<{len(parameters)}组参数>"
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f"{key}: <{type(value).__name__}>" for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(f"<{type(value).__name__}>" for value in parameters) + ')'
+    return '<无参数>'
+
+class QueryStats:
+    """一个作用域（一次HTTP请求或一次调度执行）内的SQL统计"""
+    
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.statements = 0
+        self.duration = 0.0
+        self.patterns = {}
+    
+    def record(self, normalized, duration):
+        """
+        记录一条SQL，相同SQL的执行次数达到阈值时告警一次
+        
+        Returns:
+            bool: 本次是否首次达到重复阈值
+        """
+        self.statements += 1
+        self.duration += duration
+        count = self.patterns.get(normalized, 0) + 1
+        self.patterns[normalized] = count
+        return count == _settings['repeat_threshold']
+    
+    def server_timing(self):
+        """转换为Server-Timing响应头的值"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.statements} statements"'
+
+def server_timing_enabled():
+    """是否在响应中输出Server-Timing头"""
+    return _settings['enabled'] and _settings['server_timing']
+
+def current_scope():
+    """获取当前线程正在统计的作用域，没有时返回None"""
+    return getattr(_local, 'scope', None)
+
+def begin_scope(kind, name):
+    """
+    在当前线程开始统计一个作用域
+    
+    Args:
+        kind: 作用域类型，request或tick
+        name: 作用域名称，如路由规则或调度任务名
+    
+    Returns:
+        QueryStats: 新作用域的统计，未启用时返回None
+    """
+    if not _settings['enabled']:
+        return None
+    scope = QueryStats(kind, name)
+    _local.scope = scope
+    return scope
+
+def end_scope():
+    """
+    结束当前线程的作用域并记录汇总指标
+    
+    Returns:
+        QueryStats: 已结束作用域的统计，没有正在统计的作用域时返回None
+    """
+    scope = getattr(_local, 'scope', None)
+    if scope is None:
+        return None
+    _local.scope = None
+    
+    scope_statements.observe(scope.statements, scope.kind, scope.name)
+    scope_duration.observe(scope.duration, scope.kind, scope.name)
+    logger.debug("[%s] %s: %d 条SQL，数据库耗时 %.1fms", scope.kind, scope.name, scope.statements, scope.duration * 1000)
+    return scope
+
+@contextmanager
+def query_scope(kind, name):
+    """统计代码块内执行的SQL，用于调度任务等不经过HTTP请求的场景"""
+    scope = begin_scope(kind, name)
+    try:
+        yield scope
+    finally:
+        if scope is not None:
+            end_scope()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    operation = _operation(statement)
+    statement_duration.observe(duration, operation)
+    
+    scope = getattr(_local, 'scope', None)
+    if duration < _settings['slow_query_seconds'] and scope is None:
+        return
+    
+    normalized = normalize_statement(statement)
+    if scope is not None and scope.record(normalized, duration):
+        repeated_statements.inc(scope.kind, scope.name)
+        logger.warning(
+            "疑似N+1查询 [%s] %s: 相同SQL已执行 %d 次: %s",
+            scope.kind, scope.name, _settings['repeat_threshold'], normalized
+        )
+    if duration >= _settings['slow_query_seconds']:
+        slow_statements.inc(operation)
+        scope_name = f"[{scope.kind}] {scope.name}" if scope else '[-]'
+        logger.warning(
+            "慢SQL %.1fms %s: %s 参数: %s", duration * 1000, scope_name, normalized, _redact(parameters, executemany)
+        )
+
+def _handle_error(exception_context):
+    # 执行失败时不会触发after_cursor_execute，丢弃本条SQL的开始时间
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start_time'):
+        conn.info['query_start_time'].pop()
+
+def install_query_stats(config):
+    """
+    按配置注册SQL执行统计的引擎事件，重复调用只注册一次
+    
+    Args:
+        config: Flask应用配置
+    """
+    global _installed
+    
+    _settings['enabled'] = config['QUERY_STATS_ENABLED']
+    _settings['slow_query_seconds'] = config['QUERY_STATS_SLOW_QUERY_MS'] / 1000
+    _settings['repeat_threshold'] = config['QUERY_STATS_REPEAT_THRESHOLD']
+    _settings['server_timing'] = config['QUERY_STATS_SERVER_TIMING']
+    if not _settings['enabled']:
+        return
+    
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            _installed = True
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出站请求自适应限流模块
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+class RateLimitTimeout(Exception):
+    """等待令牌超时，请求未发出"""
+    
+    def __init__(self, name, retry_after):
+        super().__init__(f"出站请求 {name} 等待令牌超时，{retry_after:.0f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限流器
+    
+    令牌按当前速率补充，桶容量为burst。收到429/503时速率乘以decrease_factor并在Retry-After
+    期间暂停发放令牌；请求成功时速率按increase_step加性恢复，最高不超过配置的max_rate（AIMD）。
+    """
+    
+    def __init__(self, name, max_rate=10, burst=20, min_rate=0.5, increase_step=0.5, decrease_factor=0.5):
+        self.name = name
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate)
+        self.burst = float(burst)
+        self.increase_step = float(increase_step)
+        self.decrease_factor = float(decrease_factor)
+        self.rate = self.max_rate
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease_at = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._deadlines = {}  # 正在等待令牌的请求 -> 等待截止时间
+    
+    def _refill(self, now):
+        """按当前速率补充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+    
+    def _try_acquire(self):
+        """
+        尝试取得一个令牌
+        
+        Returns:
+            float: 0表示已取得令牌，否则为建议的等待秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.acquired += 1
+                return 0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self, timeout=None):
+        """
+        阻塞直到取得令牌
+        
+        Args:
+            timeout: 最长等待秒数，为None时一直等待
+        
+        Returns:
+            bool: 是否取得令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = self._try_acquire()
+        if wait == 0:
+            return True
+        waiter = self._add_waiter(deadline)
+        try:
+            while wait:
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    with self._lock:
+                        self.rejected += 1
+                    return False
+                time.sleep(wait)
+                wait = self._try_acquire()
+            return True
+        finally:
+            self._remove_waiter(waiter)
+    
+    async def acquire_async(self, timeout=None):
+        """acquire的协程版本，等待期间不阻塞事件循环"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = self._try_acquire()
+        if wait == 0:
+            return True
+        waiter = self._add_waiter(deadline)
+        try:
+            while wait:
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    with self._lock:
+                        self.rejected += 1
+                    return False
+                await asyncio.sleep(wait)
+                wait = self._try_acquire()
+            return True
+        finally:
+            self._remove_waiter(waiter)
+    
+    def _add_waiter(self, deadline):
+        """登记一个等待令牌的请求，返回用于注销的标识"""
+        waiter = object()
+        with self._lock:
+            self._deadlines[waiter] = deadline
+        return waiter
+    
+    def _remove_waiter(self, waiter):
+        """注销等待令牌的请求"""
+        with self._lock:
+            del self._deadlines[waiter]
+    
+    def capacity(self, seconds):
+        """
+        估算新请求在seconds秒内最多能取得的令牌数，用于按当前速率控制一批请求的数量
+        
+        等待令牌的请求之间不排队，新请求可能先于已在等待的请求取得令牌。只统计到最早的等待截止时间为止
+        补充的令牌，并扣除正在等待的请求数，使已在等待的请求不会因新请求加入而超时。
+        
+        Args:
+            seconds: 等待令牌的最长时间
+        
+        Returns:
+            int: 令牌数，可能为负数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            horizon = min([seconds] + [deadline - now for deadline in self._deadlines.values() if deadline is not None])
+            available = max(horizon - max(self.blocked_until - now, 0), 0)
+            return int(self.tokens + available * self.rate) - len(self._deadlines)
+    
+    def on_success(self):
+        """请求成功，速率加性恢复"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+    
+    def on_throttle(self, retry_after=None):
+        """
+        上游返回429/503，速率乘性下降并在Retry-After期间暂停发放令牌
+        
+        Args:
+            retry_after: 上游要求的等待秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            # 同一轮限流中在途请求陆续返回的429只降速一次
+            if now - self.last_decrease_at >= 1.0:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self.last_decrease_at = now
+            self.tokens = 0
+            self.updated_at = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+    
+    def observe(self, status_code, retry_after_header=None):
+        """
+        根据上游响应状态码调整速率
+        
+        Args:
+            status_code: HTTP状态码
+            retry_after_header: Retry-After响应头
+        """
+        if status_code in (429, 503):
+            self.on_throttle(parse_retry_after(retry_after_header))
+        elif status_code < 400:
+            self.on_success()
+    
+    def stats(self):
+        """
+        获取限流统计信息
+        
+        Returns:
+            dict: 当前速率、速率上限、剩余令牌和各类计数
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'tokens': round(min(self.burst, self.tokens + max(now - self.updated_at, 0) * self.rate), 3),
+                'blocked_seconds': round(max(self.blocked_until - now, 0), 3),
+                'acquired': self.acquired,
+                'rejected': self.rejected,
+                'throttled': self.throttled,
+                'waiting': len(self._deadlines)
+            }
+
+def parse_retry_after(value):
+    """
+    解析Retry-After响应头，支持秒数和HTTP日期两种格式
+    
+    Returns:
+        float: 等待秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+def get_rate_limiter(name, **kwargs):
+    """
+    获取进程内共享的命名限流器，首次调用时按参数创建
+    
+    Args:
+        name: 端点类别名称
+        **kwargs: AdaptiveRateLimiter构造参数
+    
+    Returns:
+        AdaptiveRateLimiter: 限流器实例
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveRateLimiter(name, **kwargs)
+        return _limiters[name]
+
+def get_rate_limiter_stats():
+    """获取所有命名限流器的统计信息"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
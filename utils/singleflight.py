@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发请求合并模块（singleflight）
+"""
+
+import threading
+
+class _Call:
+    """一次正在执行的调用"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    合并相同键的并发调用：同一时刻相同键只执行一次，其余调用方等待并共享其结果或异常
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+    
+    def do(self, key, fn):
+        """
+        执行fn，若相同键的调用正在执行则等待其完成并返回同一结果
+        
+        Args:
+            key: 调用键
+            fn: 无参调用函数
+        
+        Returns:
+            fn的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    def stats(self):
+        """
+        获取合并统计信息
+        
+        Returns:
+            dict: 实际执行次数、被合并的调用次数和正在执行的调用数
+        """
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'in_flight': len(self._calls)
+            }
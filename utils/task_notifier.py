@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI任务分发通知模块
+"""
+
+import socket
+import threading
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 跨进程唤醒报文内容
+WAKEUP_MESSAGE = b'wakeup'
+
+class TaskNotifier:
+    """
+    新任务通知
+    
+    进程内通过事件唤醒任务分发线程；任务处理运行在其他进程时，
+    向配置的地址发送UDP唤醒报文，由对方进程的监听线程转为进程内通知。
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._targets = []
+        self._send_socket = None
+        self._listen_socket = None
+        self._listen_thread = None
+        self.notified = 0
+        # 收到的新任务通知次数（含跨进程唤醒报文），分发线程据此区分新任务通知和wake唤醒
+        self.generation = 0
+    
+    def configure(self, targets):
+        """
+        配置跨进程唤醒目标
+        
+        Args:
+            targets: host:port 字符串列表
+        """
+        self._targets = [self._parse_address(target) for target in targets]
+        if self._targets and self._send_socket is None:
+            self._send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    
+    def notify(self):
+        """通知有新任务，唤醒本进程和跨进程的任务分发线程"""
+        self.notified += 1
+        self.generation += 1
+        self._event.set()
+        
+        for target in self._targets:
+            try:
+                self._send_socket.sendto(WAKEUP_MESSAGE, target)
+            except OSError as e:
+                logger.warning("发送任务唤醒通知失败 %s: %s", target, e)
+    
+    def wait(self, timeout):
+        """
+        等待新任务通知
+        
+        Args:
+            timeout: 最长等待秒数
+        
+        Returns:
+            bool: 是否收到通知（超时返回False）
+        """
+        notified = self._event.wait(timeout)
+        self._event.clear()
+        return notified
+    
+    def start_listener(self, address):
+        """
+        监听跨进程唤醒报文
+        
+        Args:
+            address: 监听地址 host:port
+        """
+        if self._listen_thread is not None:
+            return
+        
+        self._listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 同一主机上的多个worker进程共用监听端口，唤醒报文由内核分发给其中一个
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self._listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._listen_socket.bind(self._parse_address(address))
+        self._listen_socket.settimeout(1.0)
+        self._listen_thread = threading.Thread(target=self._listen, name='task-wakeup-listener', daemon=True)
+        self._listen_thread.start()
+        logger.info(f"任务唤醒监听已启动: {address}")
+    
+    def _listen(self):
+        """监听线程入口，收到唤醒报文后设置进程内通知"""
+        listen_socket = self._listen_socket
+        while self._listen_socket is listen_socket:
+            try:
+                data, _ = listen_socket.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if data == WAKEUP_MESSAGE:
+                self.generation += 1
+                self._event.set()
+    
+    def stop_listener(self):
+        """停止监听跨进程唤醒报文"""
+        if self._listen_socket is not None:
+            listen_socket = self._listen_socket
+            self._listen_socket = None
+            self._listen_thread.join()
+            self._listen_thread = None
+            listen_socket.close()
+    
+    def wake(self):
+        """仅唤醒本进程的分发线程，不计为新任务通知，用于停止、在途任务完成等场景"""
+        self._event.set()
+    
+    @staticmethod
+    def _parse_address(address):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+
+# 全局任务通知实例
+task_notifier = TaskNotifier()
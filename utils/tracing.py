@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链路追踪模块
+
+按W3C Trace Context（traceparent）在HTTP请求中创建或延续链路，随AI任务保存到数据库，
+任务处理进程领取任务后在同一链路下记录排队等待、AI接口调用和结果写回等阶段的span。
+span由后台线程批量导出到日志目录下的JSONL文件，或以OTLP/HTTP JSON格式发送到采集端。
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import timezone
+from pathlib import Path
+import requests
+from utils.logging_config import get_logger, gzip_namer, gzip_rotator, process_file_name
+
+logger = get_logger(__name__)
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class SpanContext:
+    """跨进程传递的链路上下文"""
+    
+    def __init__(self, trace_id, span_id, sampled=True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+    
+    def to_traceparent(self):
+        """转换为traceparent请求头的值"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+    
+    @classmethod
+    def from_traceparent(cls, value):
+        """
+        解析traceparent，格式不合法时返回None
+        
+        Args:
+            value: traceparent请求头或数据库中保存的值
+        """
+        match = _TRACEPARENT.match((value or '').strip().lower())
+        if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+            return None
+        return cls(match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1)
+
+class Span:
+    """一个处理阶段的耗时记录"""
+    
+    def __init__(self, tracer, name, context, parent_span_id=None, kind='internal', start_ns=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.status_message = ''
+    
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+    
+    def set_error(self, message):
+        self.status = 'error'
+        self.status_message = str(message)
+    
+    def end(self, end_ns=None):
+        """结束span并提交导出，重复调用只导出一次"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        if self.context.sampled:
+            self.tracer.export(self)
+    
+    def to_dict(self):
+        """转换为导出的字典，字段命名与OTLP一致"""
+        return {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'parentSpanId': self.parent_span_id or '',
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'durationMs': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'attributes': self.attributes,
+            'status': {'code': self.status, 'message': self.status_message}
+        }
+
+class FileSpanExporter:
+    """每个span写为一行JSON，按大小轮转"""
+    
+    def __init__(self, path, service_name, max_bytes=10*1024*1024, backup_count=5, compress=False):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.service_name = service_name
+        self.handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        if compress:
+            self.handler.namer = gzip_namer
+            self.handler.rotator = gzip_rotator
+    
+    def export(self, spans):
+        for span in spans:
+            entry = span.to_dict()
+            entry['service'] = self.service_name
+            self.handler.emit(logging.makeLogRecord({'msg': json.dumps(entry, ensure_ascii=False, default=str)}))
+    
+    def shutdown(self):
+        self.handler.close()
+
+class OtlpHttpSpanExporter:
+    """以OTLP/HTTP JSON格式发送到采集端，如OpenTelemetry Collector的 /v1/traces"""
+    
+    KINDS = {'internal': 1, 'server': 2, 'client': 3, 'producer': 4, 'consumer': 5}
+    
+    def __init__(self, endpoint, service_name, timeout=5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+    
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+    
+    def export(self, spans):
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': 'wecode'},
+                'spans': [{
+                    'traceId': span.context.trace_id,
+                    'spanId': span.context.span_id,
+                    'parentSpanId': span.parent_span_id or '',
+                    'name': span.name,
+                    'kind': self.KINDS.get(span.kind, 1),
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [self._attribute(key, value) for key, value in span.attributes.items()],
+                    'status': {'code': 2 if span.status == 'error' else 1, 'message': span.status_message}
+                } for span in spans]
+            }]
+        }]}
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+    
+    def shutdown(self):
+        self.session.close()
+
+class Tracer:
+    """
+    进程内共享的链路追踪器
+    
+    未启用时start_span仍返回span以便调用方统一处理，但不生成导出数据。
+    结束的span放入有界队列，由后台线程按batch_size或flush_interval批量导出，队列满时丢弃。
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.batch_size = 200
+        self.flush_interval = 5
+        self.exporter = None
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.exported = 0
+        self.dropped = 0
+    
+    def configure(self, config):
+        """
+        按配置创建导出器并启动导出线程
+        
+        Args:
+            config: Flask应用配置
+        """
+        if self._thread is not None or not config['TRACING_ENABLED']:
+            return
+        
+        service_name = config['TRACING_SERVICE_NAME']
+        if config['TRACING_EXPORTER'] == 'otlp':
+            self.exporter = OtlpHttpSpanExporter(config['TRACING_OTLP_ENDPOINT'], service_name)
+        else:
+            self.exporter = FileSpanExporter(
+                Path(config['LOG_DIR']) / process_file_name(config['TRACING_FILE'], config.get('PROCESS_ROLE')),
+                service_name,
+                max_bytes=int(config['LOG_MAX_BYTES']),
+                backup_count=int(config['LOG_BACKUP_COUNT']),
+                compress=config['LOG_COMPRESS']
+            )
+        self.sample_rate = config['TRACING_SAMPLE_RATE']
+        self.batch_size = config['TRACING_BATCH_SIZE']
+        self.flush_interval = config['TRACING_FLUSH_INTERVAL']
+        self._queue = queue.Queue(maxsize=config['TRACING_QUEUE_SIZE'])
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+        self.enabled = True
+        atexit.register(self.shutdown)
+    
+    def start_span(self, name, parent=None, kind='internal', start_ns=None, attributes=None):
+        """
+        创建span，有父链路时加入该链路，否则按采样率新建链路
+        
+        Args:
+            name: span名称
+            parent: 父span、SpanContext或traceparent字符串
+            kind: server、client或internal
+            start_ns: 开始时间（纳秒时间戳），为None时为当前时间
+            attributes: span属性
+        
+        Returns:
+            Span: 新建的span，需调用end结束
+        """
+        if isinstance(parent, Span):
+            parent = parent.context
+        elif isinstance(parent, str):
+            parent = SpanContext.from_traceparent(parent)
+        
+        span_id = os.urandom(8).hex()
+        if parent is not None:
+            context = SpanContext(parent.trace_id, span_id, parent.sampled and self.enabled)
+            parent_span_id = parent.span_id
+        else:
+            sampled = self.enabled and random.random() < self.sample_rate
+            context = SpanContext(os.urandom(16).hex(), span_id, sampled)
+            parent_span_id = None
+        return Span(self, name, context, parent_span_id, kind, start_ns, attributes)
+    
+    def resume_span(self, name, traceparent, **kwargs):
+        """
+        在随任务保存的链路上下文下创建span，任务没有保存链路上下文时返回不导出的span
+        
+        Args:
+            name: span名称
+            traceparent: 任务保存的traceparent
+            **kwargs: 传给start_span的kind、start_ns、attributes
+        """
+        parent = SpanContext.from_traceparent(traceparent)
+        if parent is None:
+            parent = SpanContext('0' * 32, '0' * 16, sampled=False)
+        return self.start_span(name, parent, **kwargs)
+    
+    def record_span(self, name, traceparent, start_ns, end_ns, attributes=None):
+        """在任务的链路下记录已知起止时间的span，如从任务创建到被领取的排队等待"""
+        span = self.resume_span(name, traceparent, start_ns=start_ns, attributes=attributes)
+        span.end(end_ns)
+        return span
+    
+    def activate(self, span):
+        """把span设为当前上下文的活动span，返回用于deactivate的令牌"""
+        return _current_span.set(span)
+    
+    def deactivate(self, token):
+        _current_span.reset(token)
+    
+    def current_span(self):
+        """获取当前上下文的活动span，没有时返回None"""
+        return _current_span.get()
+    
+    def current_traceparent(self):
+        """当前活动span的traceparent，用于随任务保存；没有活动span或未采样时返回None"""
+        span = _current_span.get()
+        if span is None or not span.context.sampled:
+            return None
+        return span.context.to_traceparent()
+    
+    def export(self, span):
+        """提交已结束的span，队列满时丢弃"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _run(self):
+        """导出线程：攒批后导出，导出失败只记录日志"""
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or (self._stopping.is_set() and self._queue.empty()):
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(timeout, 0.5)))
+                except queue.Empty:
+                    continue
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.warning("导出 %d 个span失败: %s", len(batch), e)
+    
+    def shutdown(self):
+        """导出队列中剩余的span后停止导出线程"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.enabled = False
+        self.exporter.shutdown()
+    
+    def stats(self):
+        """
+        获取链路追踪统计信息
+        
+        Returns:
+            dict: 是否启用、已导出和丢弃的span数
+        """
+        return {
+            'enabled': self.enabled,
+            'exported': self.exported,
+            'dropped': self.dropped
+        }
+
+def to_unix_nano(value):
+    """把数据库中的UTC时间（不带时区）转换为纳秒时间戳"""
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1e9)
+
+# 全局链路追踪器
+tracer = Tracer()
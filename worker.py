@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI任务处理进程启动脚本
+
+只运行AI任务调度器，不启动Web服务，可与Web进程分别部署和扩容
+"""
+
+import argparse
+import signal
+import threading
+from app import create_app
+from scheduler import task_scheduler
+from utils.logging_config import get_logger
+from utils.profiler import get_profiler, install_signal_handler
+
+def parse_args():
+    """解析命令行参数，未指定时使用配置文件中worker部分的设置"""
+    parser = argparse.ArgumentParser(description='WeCodeSecTools AI任务处理进程')
+    parser.add_argument('--workers', type=int, help='工作线程数')
+    parser.add_argument('--mode', choices=['thread', 'async'], help='AI调用执行方式')
+    parser.add_argument('--async-concurrency', type=int, help='async模式下同时在途的AI调用数上限')
+    parser.add_argument('--wakeup-listen', help='监听任务唤醒报文的UDP地址 host:port，传空字符串关闭')
+    parser.add_argument('--name', default='worker',
+                        help='进程名称，作为日志和链路追踪文件名的后缀，同一主机运行多个worker进程时需各不相同')
+    return parser.parse_args()
+
+def apply_worker_config(app, args):
+    """
+    用worker配置和命令行参数覆盖调度器的并发设置
+    
+    Args:
+        app: Flask应用实例
+        args: 命令行参数
+    """
+    config = app.config
+    config['SCHEDULER_WORKERS'] = args.workers or config['WORKER_WORKERS']
+    config['SCHEDULER_MODE'] = args.mode or config['WORKER_MODE']
+    config['SCHEDULER_ASYNC_CONCURRENCY'] = args.async_concurrency or config['WORKER_ASYNC_CONCURRENCY']
+    config['SCHEDULER_WAKEUP_LISTEN'] = args.wakeup_listen if args.wakeup_listen is not None else config['WORKER_WAKEUP_LISTEN']
+
+def main():
+    """
+    主函数
+    """
+    args = parse_args()
+    app = create_app(role=args.name)
+    apply_worker_config(app, args)
+    
+    logger = get_logger('WeCodeSecTools.worker')
+    stop_event = threading.Event()
+    
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signum}，正在停止AI任务处理进程...")
+        stop_event.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    # 收到SIGUSR2时开启限时的性能分析，用于排查任务处理慢的原因
+    if app.config['PROFILER_SIGNAL']:
+        install_signal_handler(get_profiler(app.config))
+    
+    task_scheduler.start(app)
+    logger.info(
+        f"AI任务处理进程已启动，执行方式: {app.config['SCHEDULER_MODE']}，"
+        f"工作线程数: {app.config['SCHEDULER_WORKERS']}，"
+        f"唤醒监听: {app.config['SCHEDULER_WAKEUP_LISTEN'] or '未启用'}"
+    )
+    
+    # 主线程等待停止信号，带超时等待以便及时响应信号
+    while not stop_event.wait(1):
+        pass
+    
+    # 停止领取新任务，等待在途任务写回后退出
+    task_scheduler.stop()
+    logger.info("AI任务处理进程已退出")
+
+if __name__ == '__main__':
+    main()